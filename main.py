@@ -114,6 +114,11 @@ class EventMonitor:
                         self.logger.error(f"Unprocessed media upload failed: {e}", exc_info=True)
                         # エラーが発生しても新規ツイートの処理は継続
                 
+                # 全アカウントのクロール前の最新ツイート情報をまとめて取得
+                pre_crawl_latest_map = self.db_manager.get_latest_tweet_info_bulk(
+                    [account['username'] for account in self.config['monitored_accounts']]
+                )
+                
                 # 監視対象アカウントのループ
                 for account in self.config['monitored_accounts']:
                     username = account['username']
@@ -129,7 +134,8 @@ class EventMonitor:
                         username,
                         days_lookback=self.config['tweet_settings']['days_lookback'],
                         force_full_fetch=self.config['tweet_settings'].get('twscrape', {}).get('force_full_fetch', False),
-                        event_detection_enabled=account.get('event_detection_enabled', True)
+                        event_detection_enabled=account.get('event_detection_enabled', True),
+                        pre_crawl_latest_map=pre_crawl_latest_map
                     )
                     
                     if not tweets:
@@ -341,6 +347,8 @@ class EventMonitor:
             finally:
                 # TwitterMonitorのクリーンアップ
                 await self.twitter_monitor.cleanup()
+                # ログ専用アップローダーのHTTPセッションを閉じる
+                await self.log_only_uploader.close()
             
             # 6. 全アカウント処理後、データベースファイルをバックアップ
             if self.backup_manager.backup_config.get('enabled', False):
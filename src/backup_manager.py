@@ -3,8 +3,10 @@ import sys
 __import__('pysqlite3')
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
+import os
 import logging
 import json
+import shutil
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any, Optional
@@ -23,6 +25,29 @@ import random
 from .rclone_client import RcloneClient, RcloneConfig
 
 
+def _link_or_copy(src, dst):
+    """同一ファイルシステムならハードリンク、できなければコピー（shutil.copytreeのcopy_function用）"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def _count_files(root: Path) -> int:
+    """ディレクトリ以下のファイル数を数える（os.scandirのd_typeを使い、ファイルごとのstatを避ける）"""
+    count = 0
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    count += 1
+    return count
+
+
 class BackupManager:
     """Hugging Faceへのバックアップ管理クラス"""
     
@@ -1684,16 +1709,16 @@ class BackupManager:
             with tempfile.TemporaryDirectory(prefix=f"batch_upload_{username}_") as temp_dir:
                 temp_path = Path(temp_dir)
                 
-                # アカウント別のimages/とvideos/を一時フォルダにコピー
+                # アカウント別のimages/とvideos/を一時フォルダに配置（データを複製しないようハードリンクを優先）
                 if has_images:
-                    shutil.copytree(account_images_dir, temp_path / 'images' / username)
+                    shutil.copytree(account_images_dir, temp_path / 'images' / username, copy_function=_link_or_copy)
                     self.logger.info(f"Prepared images for {username}")
                 if has_videos:
-                    shutil.copytree(account_videos_dir, temp_path / 'videos' / username)
+                    shutil.copytree(account_videos_dir, temp_path / 'videos' / username, copy_function=_link_or_copy)
                     self.logger.info(f"Prepared videos for {username}")
                 
                 # ファイル数をカウント
-                file_count = sum(1 for _ in temp_path.rglob('*') if _.is_file())
+                file_count = _count_files(temp_path)
                 self.logger.info(f"Uploading {file_count} files for account {username}")
                 
                 # 大量ファイルの場合はupload_large_folder、少ない場合はupload_folder
@@ -1702,12 +1727,11 @@ class BackupManager:
                     try:
                         if file_count > 1000 and HAS_UPLOAD_LARGE_FOLDER:  # 1000ファイル以上かつ関数が利用可能
                             self.logger.info(f"Using upload_large_folder for {file_count} files")
-                            upload_large_folder(
-                                folder_path=str(temp_path),
+                            # upload_large_folderはフォルダ構成をそのままリポジトリのルートに配置する
+                            self.api.upload_large_folder(
                                 repo_id=self.full_repo_name,
+                                folder_path=str(temp_path),
                                 repo_type="dataset",
-                                token=self.api.token,
-                                path_in_repo=".",  # リポジトリのルートにアップロード
                                 ignore_patterns=["*.tmp", "*.temp", ".DS_Store", "Thumbs.db"]
                             )
                         else:
@@ -1758,11 +1782,12 @@ class BackupManager:
             self.logger.error("Username is required for batch upload")
             return
             
-        encrypted_folder = None
+        encrypted_root = None
         try:
-            # 暗号化用の一時フォルダを作成
-            encrypted_folder = folder_path.parent / f"{folder_path.name}_encrypted_{username}"
-            encrypted_folder.mkdir(exist_ok=True)
+            # 暗号化用の一時フォルダを作成（リポジトリ上と同じ batch_encrypted/{username} の階層）
+            encrypted_root = folder_path.parent / f"{folder_path.name}_encrypted_{username}"
+            encrypted_folder = encrypted_root / "batch_encrypted" / username
+            encrypted_folder.mkdir(parents=True, exist_ok=True)
             
             file_mappings = {}  # 元ファイル -> 暗号化ファイルのマッピング
             
@@ -1814,6 +1839,9 @@ class BackupManager:
                         
                     except Exception as e:
                         self.logger.error(f"Failed to process {original_file}: {e}")
+                
+                # 移動後に残った一時ディレクトリを削除
+                self.rclone_client.cleanup_temp_files(encrypted_files)
             
             # マッピングファイルを保存
             if file_mappings:
@@ -1823,7 +1851,7 @@ class BackupManager:
                 self.logger.info(f"Created encryption mapping with {len(file_mappings)} entries")
             
             # ファイル数をカウント
-            file_count = sum(1 for _ in encrypted_folder.rglob('*') if _.is_file())
+            file_count = _count_files(encrypted_folder)
             
             # 大量ファイルの場合はupload_large_folder、少ない場合はupload_folder
             self.logger.info(f"Uploading encrypted folder using upload API ({file_count} files)")
@@ -1832,12 +1860,12 @@ class BackupManager:
                 try:
                     if file_count > 1000 and HAS_UPLOAD_LARGE_FOLDER:  # 1000ファイル以上かつ関数が利用可能
                         self.logger.info(f"Using upload_large_folder for {file_count} files")
-                        upload_large_folder(
-                            folder_path=str(encrypted_folder),
+                        # upload_large_folderはpath_in_repoを指定できないため、
+                        # batch_encrypted/{username} の階層ごと持つencrypted_rootをアップロード
+                        self.api.upload_large_folder(
                             repo_id=self.full_repo_name,
+                            folder_path=str(encrypted_root),
                             repo_type="dataset",
-                            token=self.api.token,
-                            path_in_repo=f"batch_encrypted/{username}",  # ユーザー名ごとに分離
                             ignore_patterns=["*.tmp", "*.temp", ".DS_Store", "Thumbs.db"]
                         )
                     else:
@@ -1872,18 +1900,18 @@ class BackupManager:
                 self.logger.info(f"Deleted original folder: {folder_path}")
             
             # 暗号化フォルダは常に削除（一時ファイル）
-            if encrypted_folder and encrypted_folder.exists():
+            if encrypted_root and encrypted_root.exists():
                 import shutil
-                shutil.rmtree(encrypted_folder)
-                self.logger.info(f"Deleted encrypted folder: {encrypted_folder}")
+                shutil.rmtree(encrypted_root)
+                self.logger.info(f"Deleted encrypted folder: {encrypted_root}")
             
         except Exception as e:
             self.logger.error(f"Batch encrypted upload failed: {e}")
             # クリーンアップ
-            if encrypted_folder and encrypted_folder.exists():
+            if encrypted_root and encrypted_root.exists():
                 try:
                     import shutil
-                    shutil.rmtree(encrypted_folder)
+                    shutil.rmtree(encrypted_root)
                 except:
                     pass
             raise
\ No newline at end of file
@@ -6,10 +6,10 @@ sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 import os
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import json
 
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Boolean, Integer
+from sqlalchemy import create_engine, Column, String, DateTime, Text, Boolean, Integer, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
@@ -88,6 +88,15 @@ class LogOnlyTweet(Base):
     uploaded_to_hf = Column(Boolean, default=False)
 
 
+class HFMediaHash(Base):
+    """アップロード済みメディアの内容ハッシュとHugging Face URLの対応"""
+    __tablename__ = 'hf_media_hashes'
+    
+    sha256 = Column(String(64), primary_key=True)  # 元ファイル（暗号化前）のSHA-256
+    hf_url = Column(String(500), nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+
 class DatabaseManager:
     def __init__(self, config: dict):
         self.config = config
@@ -385,8 +394,15 @@ class DatabaseManager:
         finally:
             session.close()
     
-    def get_existing_tweet_ids(self, username: str) -> set:
-        """指定ユーザーの既存ツイートIDセットを取得（重複チェック用）"""
+    def get_existing_tweet_ids(self, username: str, as_int: bool = False) -> set:
+        """指定ユーザーの既存ツイートIDセットを取得（重複チェック用）
+        
+        Args:
+            as_int: Trueの場合はIDをintで返す（twscrapeのint IDと変換なしで比較できる）
+        
+        Returns:
+            ツイートID（str、as_int時はint）のset。呼び出し側はO(1)のメンバーシップ判定に使用できる
+        """
         session = self._get_session()
         try:
             # all_tweetsテーブルから該当ユーザーの全ツイートIDを取得
@@ -395,6 +411,29 @@ class DatabaseManager:
             ).all()
             
             # セットに変換して返す
+            if as_int:
+                return {int(tweet_id[0]) for tweet_id in tweet_ids}
+            return {tweet_id[0] for tweet_id in tweet_ids}
+            
+        except SQLAlchemyError as e:
+            self.logger.error(f"Failed to get existing tweet IDs for {username}: {e}")
+            return set()
+        finally:
+            session.close()
+    
+    def get_existing_tweet_ids_since(self, username: str, since_date: datetime, as_int: bool = False) -> set:
+        """指定ユーザーのsince_date以降の既存ツイートIDセットを取得（差分取得時の重複チェック用、as_intはget_existing_tweet_idsと同じ）"""
+        session = self._get_session()
+        try:
+            # データベースの日時はタイムゾーンなし（UTC）で保存されている
+            if since_date.tzinfo is not None:
+                since_date = since_date.astimezone(timezone.utc).replace(tzinfo=None)
+            tweet_ids = session.query(AllTweets.id).filter(
+                AllTweets.username == username,
+                AllTweets.tweet_date >= since_date
+            ).all()
+            if as_int:
+                return {int(tweet_id[0]) for tweet_id in tweet_ids}
             return {tweet_id[0] for tweet_id in tweet_ids}
             
         except SQLAlchemyError as e:
@@ -403,6 +442,46 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_latest_tweet_info_bulk(self, usernames: List[str]) -> Dict[str, Tuple[datetime, str]]:
+        """複数ユーザーの最新ツイート日付とIDを1クエリで取得（ツイートがあるユーザーのみ）
+        
+        Returns:
+            {username: (最新ツイート日付（UTC）, 最新ツイートID)}
+        """
+        if not usernames:
+            return {}
+        
+        session = self._get_session()
+        try:
+            latest = session.query(
+                AllTweets.username,
+                func.max(AllTweets.tweet_date).label('max_date')
+            ).filter(
+                AllTweets.username.in_(usernames)
+            ).group_by(AllTweets.username).subquery()
+            
+            rows = session.query(AllTweets.username, AllTweets.tweet_date, AllTweets.id).join(
+                latest,
+                (AllTweets.username == latest.c.username) & (AllTweets.tweet_date == latest.c.max_date)
+            ).all()
+            
+            result = {}
+            for row in rows:
+                if row.username in result:
+                    continue
+                # データベースの日時はタイムゾーンなしなので、UTCとして扱う
+                tweet_date = row.tweet_date
+                if tweet_date.tzinfo is None:
+                    tweet_date = tweet_date.replace(tzinfo=timezone.utc)
+                result[row.username] = (tweet_date, row.id)
+            return result
+            
+        except SQLAlchemyError as e:
+            self.logger.error(f"Failed to get latest tweet info for {len(usernames)} users: {e}")
+            return {}
+        finally:
+            session.close()
+    
     def update_all_tweet_hf_urls(self, tweet_id: str, huggingface_urls: List[str]):
         """all_tweetsテーブルのHugging Face URLsを更新"""
         session = self._get_session()
@@ -632,6 +711,29 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_log_only_tweet_hf_urls_bulk(self, tweet_ids: List[str]) -> Dict[str, List[str]]:
+        """複数のログ専用ツイートのHugging Face URLを1クエリで取得（URLがあるツイートのみ）"""
+        if not tweet_ids:
+            return {}
+        
+        session = self._get_session()
+        
+        try:
+            rows = session.query(LogOnlyTweet.id, LogOnlyTweet.huggingface_urls).filter(
+                LogOnlyTweet.id.in_(tweet_ids)
+            ).all()
+            
+            return {
+                row.id: json.loads(row.huggingface_urls)
+                for row in rows
+                if row.huggingface_urls
+            }
+        except Exception as e:
+            self.logger.error(f"Failed to get HF URLs for log-only tweets: {e}")
+            return {}
+        finally:
+            session.close()
+    
     def update_log_only_tweet_hf_urls(self, tweet_id: str, huggingface_urls: List[str]):
         """ログ専用ツイートのHugging Face URLを更新"""
         session = self._get_session()
@@ -655,6 +757,67 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def update_log_only_tweet_hf_urls_many(self, updates: List[Tuple[str, List[str]]]):
+        """複数のログ専用ツイートのHugging Face URLを1トランザクションで更新"""
+        if not updates:
+            return
+        
+        session = self._get_session()
+        
+        try:
+            urls_by_id = dict(updates)
+            tweets = session.query(LogOnlyTweet).filter(
+                LogOnlyTweet.id.in_(list(urls_by_id))
+            ).all()
+            
+            for tweet in tweets:
+                tweet.huggingface_urls = json.dumps(urls_by_id[tweet.id])
+                tweet.uploaded_to_hf = True
+            session.commit()
+            
+            missing = len(urls_by_id) - len(tweets)
+            if missing:
+                self.logger.warning(f"{missing} log-only tweets not found in database")
+            self.logger.debug(f"Updated HF URLs for {len(tweets)} log-only tweets")
+                
+        except SQLAlchemyError as e:
+            session.rollback()
+            self.logger.error(f"Failed to update log-only tweet HF URLs: {e}")
+        finally:
+            session.close()
+    
+    def get_hf_media_url_by_sha256(self, sha256: str) -> Optional[str]:
+        """同じ内容のメディアをアップロード済みならそのHugging Face URLを取得"""
+        session = self._get_session()
+        
+        try:
+            row = session.get(HFMediaHash, sha256)
+            return row.hf_url if row else None
+        except Exception as e:
+            self.logger.error(f"Failed to get HF URL for media hash {sha256}: {e}")
+            return None
+        finally:
+            session.close()
+    
+    def save_hf_media_hashes(self, hashes: List[Tuple[str, str]]):
+        """メディアの内容ハッシュとHugging Face URLの対応を1トランザクションで保存"""
+        if not hashes:
+            return
+        
+        session = self._get_session()
+        
+        try:
+            for sha256, hf_url in dict(hashes).items():
+                session.merge(HFMediaHash(sha256=sha256, hf_url=hf_url))
+            session.commit()
+            self.logger.debug(f"Saved {len(hashes)} media hashes")
+            
+        except SQLAlchemyError as e:
+            session.rollback()
+            self.logger.error(f"Failed to save media hashes: {e}")
+        finally:
+            session.close()
+    
     def get_tweet_count_for_user(self, username: str) -> int:
         """指定ユーザーのツイート数を取得（all_tweetsテーブル）"""
         session = self._get_session()
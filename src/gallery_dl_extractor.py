@@ -13,14 +13,25 @@ from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# この件数以上のツイートを既存IDと突き合わせる場合はnumpyで一括判定する
+NUMPY_FILTER_THRESHOLD = 20000
+
 
 class GalleryDLExtractor:
     """gallery-dlを使用してメディア付きツイートを取得"""
     
-    def __init__(self, config: dict, event_detector=None):
+    def __init__(self, config: dict, event_detector=None, db_manager=None):
         self.config = config
         self.logger = logging.getLogger("EventMonitor.GalleryDL")
         self.event_detector = event_detector
+        # 既存ツイートID確認用（未指定の場合は初回使用時に生成）
+        self.db_manager = db_manager
         
         # Cookie設定（ローテーション対応）
         from .gallery_dl_cookie_rotator import GalleryDLCookieRotator
@@ -35,6 +46,13 @@ class GalleryDLExtractor:
         # ラッパースクリプトのパス
         self.wrapper_path = Path(__file__).parent / 'gallery_dl_wrapper.py'
         
+    def _get_db_manager(self):
+        """DatabaseManagerを取得（未設定の場合は一度だけ生成して使い回す）"""
+        if self.db_manager is None:
+            from .database import DatabaseManager
+            self.db_manager = DatabaseManager(self.config)
+        return self.db_manager
+    
     def fetch_media_tweets(self, username: str, limit: Optional[int] = None, is_private_account: bool = False) -> List[Dict[str, Any]]:
         """
         指定ユーザーのメディア付きツイートを取得
@@ -702,6 +720,33 @@ class GalleryDLExtractor:
         
         return sorted_tweets
     
+    def _filter_new_tweets(self, tweets: List[Dict[str, Any]], existing_tweet_ids: set) -> List[Dict[str, Any]]:
+        """
+        既存IDに含まれないツイートのみを抽出
+        
+        大量のツイート（初回の全件取得など）はnumpyのソート済み探索で一括判定し、
+        それ以外はsetのメンバーシップ判定を使う
+        
+        Args:
+            tweets: 判定対象のツイート
+            existing_tweet_ids: 既存ツイートID（str）のset
+            
+        Returns:
+            既存IDに含まれないツイートのリスト（元の順序を維持）
+        """
+        if HAS_NUMPY and existing_tweet_ids and len(tweets) >= NUMPY_FILTER_THRESHOLD:
+            try:
+                ids = np.fromiter((int(tweet['id']) for tweet in tweets), dtype=np.int64, count=len(tweets))
+                existing_ids = np.fromiter((int(tweet_id) for tweet_id in existing_tweet_ids), dtype=np.int64, count=len(existing_tweet_ids))
+                # idsは重複し得るのでassume_uniqueは指定しない
+                mask = ~np.isin(ids, existing_ids)
+                return [tweets[i] for i in np.flatnonzero(mask)]
+            except (ValueError, OverflowError):
+                # 数値に変換できないIDが含まれる場合はsetで判定
+                self.logger.debug("Non-numeric tweet IDs found, falling back to set lookup")
+        
+        return [tweet for tweet in tweets if tweet['id'] not in existing_tweet_ids]
+    
     async def fetch_and_analyze_tweets(self, username: str, limit: Optional[int] = None, event_detection_enabled: bool = True, is_private_account: bool = False) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
         gallery-dlでツイートを取得してイベント判定も実行
@@ -725,16 +770,11 @@ class GalleryDLExtractor:
         # イベント判定が設定されていて有効な場合のみ実行
         event_tweets = []
         if self.event_detector and self.event_detector.enabled and event_detection_enabled:
-            # DatabaseManagerを使用してall_tweetsテーブルの既存IDを確認
-            from .database import DatabaseManager
-            db_manager = DatabaseManager(self.config)
-            existing_tweet_ids = db_manager.get_existing_tweet_ids(username)
+            # DatabaseManagerを使用してall_tweetsテーブルの既存IDを確認（set[str]）
+            existing_tweet_ids = self._get_db_manager().get_existing_tweet_ids(username)
             
             # 既にall_tweetsテーブルに存在する（=過去に処理済み）ツイートを除外
-            new_tweets = [
-                tweet for tweet in tweets 
-                if tweet['id'] not in existing_tweet_ids
-            ]
+            new_tweets = self._filter_new_tweets(tweets, existing_tweet_ids)
             
             if new_tweets:
                 self.logger.info(f"Running event detection on {len(new_tweets)} new tweets from @{username} (skipping {len(tweets) - len(new_tweets)} already in DB)")
@@ -1,20 +1,134 @@
 import aiohttp
 import asyncio
+import functools
 import hashlib
 import json
 import logging
 import os
 import re
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 logger = logging.getLogger(__name__)
 
+# ハッシュ計算時の読み込みサイズ
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Hydrusにインポートしない動画ファイルの拡張子
+_VIDEO_EXTS = frozenset({'.mp4', '.mov', '.avi', '.webm', '.mkv', '.flv', '.wmv', '.m3u8'})
+
+# t.coリンク（TwitterのURL短縮）
+_TCO_RE = re.compile(r'https?://t\.co/\S+')
+# 連続する空白（タブ・改行を含む）
+_WS_RE = re.compile(r'\s+')
+# 改行とその前後の空白（空行を含む）
+_LINE_BREAK_RE = re.compile(r'\s*\n\s*')
+# タブを空白に置換する変換テーブル
+_TAB_TO_SPACE = str.maketrans('\t', ' ')
+
+
+def _find_title_tag(tags: List[str]) -> Optional[str]:
+    """タグリストから最初のtitle:タグを返す（見つかった時点で走査を終了）"""
+    return next((tag for tag in tags if tag.startswith('title:')), None)
+
+
+def _prevalidate_media(local_media: List[str]) -> List[str]:
+    """
+    インポート対象の画像パスを抽出（ブロッキングI/Oを含むためスレッドで呼ぶこと）
+    
+    Args:
+        local_media: ローカルメディアパスのリスト
+        
+    Returns:
+        存在するimages/ディレクトリ内の動画以外のファイルパスのリスト
+    """
+    valid_media = []
+    for image_path in local_media:
+        # images/ディレクトリのファイルのみ処理（videos/は動画・音声ファイルなのでスキップ）
+        if 'images/' not in image_path:
+            logger.info("images/ディレクトリ外のファイルはスキップ: %s", image_path)
+            continue
+        
+        dot = image_path.rfind('.')
+        if dot != -1 and image_path[dot:].lower() in _VIDEO_EXTS:
+            logger.info("動画ファイルはスキップします: %s", image_path)
+            continue
+        
+        if not os.path.exists(image_path):
+            logger.warning("画像ファイルが見つかりません: %s", image_path)
+            continue
+        
+        valid_media.append(image_path)
+    return valid_media
+
+
+def _compile_tag_template(template: str, field: str) -> Callable[[str], str]:
+    """
+    'creator:{name}'のようなタグ形式を事前に前後の文字列へ分割し、
+    呼び出し毎のstr.formatの解析を省いた関数を返す
+    
+    Args:
+        template: タグ形式（config.yamlの*_tag_format）
+        field: 置換するフィールド名
+        
+    Returns:
+        値を受け取りタグ文字列を返す関数
+    """
+    sentinel = '\x00'
+    parts = template.format(**{field: sentinel}).split(sentinel)
+    if len(parts) != 2:
+        # フィールドが複数回（または0回）現れる形式はそのままformatする
+        return lambda value: template.format(**{field: value})
+    prefix, suffix = parts
+    return lambda value: f"{prefix}{value}{suffix}"
+
+
+@functools.lru_cache(maxsize=8192)
+def _title_from_text(tweet_text: str) -> str:
+    """ツイート本文からtitle:タグ用の1行目を生成（t.coリンク除去・空白圧縮・100文字制限）"""
+    # t.coリンクを除去（TwitterのURL短縮）
+    cleaned_text = _TCO_RE.sub('', tweet_text).strip()
+    # 最初の行のみを取得（改行で分割して最初の要素）
+    first_line = cleaned_text.partition('\n')[0]
+    # タブ・連続する空白を1つに圧縮
+    first_line = _WS_RE.sub(' ', first_line).strip()
+    # 最初の行が長すぎる場合は100文字で切る
+    if len(first_line) > 100:
+        first_line = first_line[:97] + "..."
+    return first_line
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """リクエストボディ用にJSONをバイト列へシリアライズ（orjsonがあれば使用）"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(raw: bytes) -> Any:
+    """レスポンスボディのJSONをデシリアライズ（orjsonがあれば使用）"""
+    if HAS_ORJSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 
 class HydrusClient:
     """Hydrus Client APIとの連携を管理するクラス"""
     
+    # _generate_tagsのキャッシュ上限（ツイート数）
+    _TAG_CACHE_SIZE = 1024
+    # ファイルメタデータのキャッシュ有効期間（秒）と上限（ファイル数）
+    _METADATA_CACHE_TTL = 60
+    _METADATA_CACHE_SIZE = 1024
+    
     def __init__(self, config: Dict[str, Any]):
         """
         初期化
@@ -27,15 +141,31 @@ class HydrusClient:
         
         self.enabled = hydrus_config.get('enabled', False)
         self.api_url = hydrus_config.get('api_url', 'http://127.0.0.1:45869')
+        # 頻繁に呼ぶエンドポイントのURLを事前に構築
+        self._metadata_url = f"{self.api_url}/get_files/file_metadata?hash="
+        self._undelete_url = f"{self.api_url}/add_files/undelete_files"
         # 環境変数を優先、なければconfig.yamlから取得
         self.access_key = os.environ.get('HYDRUS_ACCESS_KEY') or hydrus_config.get('access_key')
         self.tag_service_key = hydrus_config.get('tag_service_key', '6c6f63616c2074616773')  # "local tags"
         
         self.import_settings = hydrus_config.get('import_settings', {})
+        # 同時インポート数（Hydrusは単一書き込みのため多すぎると逆に遅くなる）
+        self._import_semaphore = asyncio.Semaphore(self.import_settings.get('max_concurrent_imports', 8))
         self.tag_settings = hydrus_config.get('tag_settings', {})
+        # タグ生成のホットパスで使う設定値を事前に取り出しておく
+        self._base_tags = list(self.tag_settings.get('base_tags', []))
+        self._creator_tag = _compile_tag_template(self.tag_settings.get('creator_tag_format', 'creator:{name}'), 'name')
+        self._event_tag = _compile_tag_template(self.tag_settings.get('event_tag_format', 'event:{name}'), 'name')
+        self._date_tag = _compile_tag_template(self.tag_settings.get('date_tag_format', 'date:{date}'), 'date')
+        self._include_title_tag = self.tag_settings.get('include_title_tag', True)
+        self._include_date_tag = self.tag_settings.get('include_date_tag', False)
+        self._include_detected_keywords = self.tag_settings.get('include_detected_keywords', True)
         
         self.session: Optional[aiohttp.ClientSession] = None
         self._session_key: Optional[str] = None
+        self._tag_cache: Dict[tuple, List[str]] = {}
+        self._metadata_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._update_headers()
         
         if self.enabled and not self.access_key:
             logger.warning("Hydrus連携が有効ですが、access_keyが設定されていません")
@@ -62,23 +192,26 @@ class HydrusClient:
             headers = {'Hydrus-Client-API-Access-Key': self.access_key}
             async with self.session.get(f"{self.api_url}/session_key", headers=headers) as resp:
                 if resp.status == 200:
-                    data = await resp.json()
+                    data = _json_loads(await resp.read())
                     self._session_key = data.get('session_key')
+                    self._update_headers()
                     logger.info("Hydrus APIセッションキーを取得しました")
                     return self._session_key
                 else:
-                    logger.error(f"セッションキー取得エラー: {resp.status}")
+                    logger.error("セッションキー取得エラー: %s", resp.status)
                     return None
         except Exception as e:
-            logger.error(f"Hydrus API接続エラー: {e}")
+            logger.error("Hydrus API接続エラー: %s", e)
             return None
     
-    def _get_headers(self) -> Dict[str, str]:
-        """APIリクエスト用のヘッダーを取得"""
+    def _update_headers(self):
+        """APIリクエスト用のヘッダーを事前に構築（リクエスト毎のdict生成を避ける）"""
         if self._session_key:
-            return {'Hydrus-Client-API-Session-Key': self._session_key}
+            self._headers = {'Hydrus-Client-API-Session-Key': self._session_key}
         else:
-            return {'Hydrus-Client-API-Access-Key': self.access_key}
+            self._headers = {'Hydrus-Client-API-Access-Key': self.access_key}
+        self._json_headers = {**self._headers, 'Content-Type': 'application/json'}
+        self._binary_headers = {**self._headers, 'Content-Type': 'application/octet-stream'}
     
     async def import_file(self, file_path: Path) -> Optional[str]:
         """
@@ -94,82 +227,81 @@ class HydrusClient:
             return None
         
         # 動画ファイルの拡張子チェック
-        video_extensions = ['.mp4', '.mov', '.avi', '.webm', '.mkv', '.flv', '.wmv', '.m3u8']
-        if file_path.suffix.lower() in video_extensions:
-            logger.info(f"動画ファイルはスキップします: {file_path}")
+        if file_path.suffix.lower() in _VIDEO_EXTS:
+            logger.info("動画ファイルはスキップします: %s", file_path)
             return None
             
         try:
-            # ファイルハッシュを計算
-            file_hash = self._calculate_file_hash(file_path)
+            # ファイルハッシュを計算（イベントループをブロックしないようスレッドで実行）
+            file_hash = await asyncio.to_thread(self._calculate_file_hash, file_path)
             
             # 既存チェック（メタデータがあるかも確認）
             if self.import_settings.get('skip_existing', True):
                 exists, has_metadata = await self._check_file_exists_with_metadata(file_hash)
                 if exists and has_metadata:
-                    logger.info(f"ファイルは既にHydrusに存在し、メタデータもあります: {file_path}")
+                    logger.info("ファイルは既にHydrusに存在し、メタデータもあります: %s", file_path)
                     return file_hash
                 elif exists and not has_metadata:
-                    logger.info(f"ファイルは存在しますが、メタデータが削除されています。再インポートをスキップしてタグのみ追加します: {file_path}")
+                    logger.info("ファイルは存在しますが、メタデータが削除されています。再インポートをスキップしてタグのみ追加します: %s", file_path)
                     return file_hash
             
             # ファイルをインポート
-            headers = self._get_headers()
-            headers['Content-Type'] = 'application/octet-stream'
+            headers = self._binary_headers
             
-            # ファイルをバイナリデータとして読み込む
+            # ファイルオブジェクトを渡してディスクからソケットへストリーミング送信
+            # （aiohttpがスレッドでチャンク読み込みするため全体をメモリに載せない）
             with open(file_path, 'rb') as f:
-                file_data = f.read()
-            
-            async with self.session.post(
-                f"{self.api_url}/add_files/add_file",
-                headers=headers,
-                data=file_data
-            ) as resp:
-                if resp.status == 200:
-                    result = await resp.json()
-                    status = result.get('status')
-                    logger.info(f"Import status for {file_path}: {status}")
-                    if status in [1, 2]:  # 1=success, 2=already in db
-                        if status == 2:
-                            logger.info(f"ファイルは既にDBに存在: {file_path}")
-                        else:
-                            logger.info(f"ファイルをインポートしました: {file_path}")
-                        return result.get('hash')
-                    elif status == 3:  # 3=previously deleted
-                        logger.warning(f"ファイルは以前削除されました。削除を解除して再インポートします: {file_path}")
-                        file_hash = result.get('hash')
-                        logger.debug(f"Previously deleted file hash: {file_hash}")
-                        
-                        # 削除を解除して再インポート
-                        if await self._undelete_file(file_hash):
-                            logger.info(f"削除解除成功。既存のタグを確認します: {file_hash}")
-                            
-                            # 削除解除後、既存のタグを確認（デバッグ用）
-                            existing_tags = await self._get_file_tags(file_hash)
-                            logger.info(f"既存のタグ数: {len(existing_tags) if existing_tags else 0}")
-                            if existing_tags:
-                                logger.debug(f"既存のタグ: {existing_tags}")
-                                # title:タグの存在確認
-                                title_tags = [tag for tag in existing_tags if tag.startswith('title:')]
-                                if title_tags:
-                                    logger.warning(f"既存のtitle:タグが見つかりました: {title_tags}")
-                                else:
-                                    logger.info("既存のtitle:タグは見つかりませんでした")
+                async with self.session.post(
+                    f"{self.api_url}/add_files/add_file",
+                    headers=headers,
+                    data=f
+                ) as resp:
+                    if resp.status == 200:
+                        result = _json_loads(await resp.read())
+                        status = result.get('status')
+                        logger.info("Import status for %s: %s", file_path, status)
+                        if status in [1, 2]:  # 1=success, 2=already in db
+                            if status == 2:
+                                logger.info("ファイルは既にDBに存在: %s", file_path)
+                            else:
+                                logger.info("ファイルをインポートしました: %s", file_path)
+                            self._invalidate_metadata(result.get('hash'))
+                            return result.get('hash')
+                        elif status == 3:  # 3=previously deleted
+                            logger.warning("ファイルは以前削除されました。削除を解除して再インポートします: %s", file_path)
+                            file_hash = result.get('hash')
+                            logger.debug("Previously deleted file hash: %s", file_hash)
                             
-                            return file_hash
+                            # 削除を解除して再インポート
+                            if await self._undelete_file(file_hash):
+                                logger.info("削除解除成功。既存のタグを確認します: %s", file_hash)
+                                
+                                # 削除解除後、既存のタグを確認（デバッグ用、DEBUG時のみAPIを呼ぶ）
+                                if logger.isEnabledFor(logging.DEBUG):
+                                    existing_tags = await self._get_file_tags(file_hash)
+                                    logger.debug("既存のタグ数: %s", len(existing_tags) if existing_tags else 0)
+                                    if existing_tags:
+                                        logger.debug("既存のタグ: %s", existing_tags)
+                                        # title:タグの存在確認
+                                        title_tag = _find_title_tag(existing_tags)
+                                        if title_tag:
+                                            logger.debug("既存のtitle:タグが見つかりました: %s", title_tag)
+                                        else:
+                                            logger.debug("既存のtitle:タグは見つかりませんでした")
+                                
+                                return file_hash
+                            else:
+                                logger.error("削除解除に失敗: %s", file_path)
+                                return None
                         else:
-                            logger.error(f"削除解除に失敗: {file_path}")
+                            logger.error("インポート失敗: %s", result)
                             return None
                     else:
-                        logger.error(f"インポート失敗: {result}")
+                        logger.error("インポートAPIエラー: %s", resp.status)
                         return None
-                else:
-                    logger.error(f"インポートAPIエラー: {resp.status}")
-                    return None
-                    
+                        
         except Exception as e:
-            logger.error(f"ファイルインポートエラー: {e}")
+            logger.error("ファイルインポートエラー: %s", e)
             return None
     
     async def add_tags(self, file_hash: str, tags: List[str]) -> bool:
@@ -187,18 +319,17 @@ class HydrusClient:
             return False
             
         try:
-            logger.debug(f"タグ追加開始: {file_hash}")
-            logger.debug(f"追加するタグ: {tags}")
+            logger.debug("タグ追加開始: %s", file_hash)
+            logger.debug("追加するタグ: %s", tags)
             
             # title:タグの存在確認
-            title_tags_to_add = [tag for tag in tags if tag.startswith('title:')]
-            if title_tags_to_add:
-                logger.info(f"title:タグを追加します: {title_tags_to_add[0][:100]}...")
+            title_tag_to_add = _find_title_tag(tags)
+            if title_tag_to_add:
+                logger.info("title:タグを追加します: %s...", title_tag_to_add[:100])
             else:
                 logger.warning("追加するタグにtitle:タグが含まれていません")
             
-            headers = self._get_headers()
-            headers['Content-Type'] = 'application/json'
+            headers = self._json_headers
             
             data = {
                 'hashes': [file_hash],
@@ -213,29 +344,31 @@ class HydrusClient:
             async with self.session.post(
                 f"{self.api_url}/add_tags/add_tags",
                 headers=headers,
-                json=data
+                data=_json_dumps(data)
             ) as resp:
                 if resp.status == 200:
-                    logger.info(f"タグを追加しました: {len(tags)}個")
+                    self._invalidate_metadata(file_hash)
+                    logger.info("タグを追加しました: %s個", len(tags))
                     
-                    # 追加後のタグを確認（デバッグ用）
-                    updated_tags = await self._get_file_tags(file_hash)
-                    if updated_tags is not None:
-                        new_title_tags = [tag for tag in updated_tags if tag.startswith('title:')]
-                        if new_title_tags:
-                            logger.info(f"追加後のtitle:タグ: {new_title_tags[0][:100]}...")
-                        else:
-                            logger.error("タグ追加後もtitle:タグが見つかりません！")
+                    # 追加後のタグを確認（デバッグ用、DEBUG時のみAPIを呼ぶ）
+                    if logger.isEnabledFor(logging.DEBUG):
+                        updated_tags = await self._get_file_tags(file_hash)
+                        if updated_tags is not None:
+                            new_title_tag = _find_title_tag(updated_tags)
+                            if new_title_tag:
+                                logger.debug("追加後のtitle:タグ: %s...", new_title_tag[:100])
+                            else:
+                                logger.error("タグ追加後もtitle:タグが見つかりません！")
                     
                     return True
                 else:
-                    logger.error(f"タグ追加APIエラー: {resp.status}")
+                    logger.error("タグ追加APIエラー: %s", resp.status)
                     error_text = await resp.text()
-                    logger.error(f"エラー詳細: {error_text}")
+                    logger.error("エラー詳細: %s", error_text)
                     return False
                     
         except Exception as e:
-            logger.error(f"タグ追加エラー: {e}")
+            logger.error("タグ追加エラー: %s", e)
             return False
     
     async def import_tweet_images(self, tweet_data: Dict[str, Any], 
@@ -250,7 +383,7 @@ class HydrusClient:
         Returns:
             インポートされたファイルの(パス, ハッシュ)のリスト
         """
-        logger.info(f"import_tweet_images called for tweet {tweet_data.get('id')} with {len(local_media) if local_media else 0} images")
+        logger.info("import_tweet_images called for tweet %s with %s images", tweet_data.get('id'), len(local_media) if local_media else 0)
         if not self.enabled or not local_media:
             return []
             
@@ -261,125 +394,155 @@ class HydrusClient:
         username = tweet_data.get('username')
         tweet_url = f"https://twitter.com/{username}/status/{tweet_id}" if tweet_id and username else None
         
-        for image_path in local_media:
-            file_path = Path(image_path)
-            if not file_path.exists():
-                logger.warning(f"画像ファイルが見つかりません: {image_path}")
-                continue
-            
-            # images/ディレクトリのファイルのみ処理（videos/は動画・音声ファイルなのでスキップ）
-            if 'images/' not in str(file_path) and not str(file_path).startswith('images/'):
-                logger.info(f"images/ディレクトリ外のファイルはスキップ: {file_path}")
-                continue
+        # タグとnote用テキストは画像に依存しないためループ前に一度だけ生成
+        logger.info("Generating tags for tweet %s", tweet_id)
+        tags = self._generate_tags(tweet_data)
+        logger.info("Generated tags: %s", tags)
+        cleaned_text = self._clean_note_text(tweet_data.get('content') or tweet_data.get('text', ''))
+        
+        # 存在確認（stat）はイベントループをブロックしないよう一度にスレッドで実行
+        valid_media = await asyncio.to_thread(_prevalidate_media, local_media)
+        
+        # 画像ごとのインポートを並行実行し、完了したものから順に結果を回収
+        tasks = [
+            asyncio.create_task(self._import_tweet_image(image_path, tweet_url, tags, cleaned_text))
+            for image_path in valid_media
+        ]
+        for future in asyncio.as_completed(tasks):
+            result = await future
+            if result:
+                imported.append(result)
                 
+        return imported
+    
+    async def _import_tweet_image(self, image_path: str, tweet_url: Optional[str],
+                                  tags: List[str], cleaned_text: str) -> Optional[Tuple[str, str]]:
+        """
+        ツイートの画像1枚をインポートし、URL・タグ・noteを付与
+        
+        Args:
+            image_path: ローカル画像パス
+            tweet_url: known URLとして関連付けるツイートURL
+            tags: 追加するタグのリスト
+            cleaned_text: noteとして追加するツイート本文
+            
+        Returns:
+            タグ追加に成功した場合は(パス, ハッシュ)、それ以外はNone
+        """
+        # Hydrusは単一書き込みのため同時インポート数を制限
+        async with self._import_semaphore:
+            file_path = Path(image_path)
+            
             # ファイルをインポート（または既存ファイルのハッシュを取得）
-            logger.info(f"Importing file: {file_path}")
+            logger.info("Importing file: %s", file_path)
             file_hash = await self.import_file(file_path)
-            logger.info(f"Import returned hash: {file_hash}")
+            logger.info("Import returned hash: %s", file_hash)
             if not file_hash:
-                logger.error(f"Failed to get file hash for: {file_path}")
-                continue
+                logger.error("Failed to get file hash for: %s", file_path)
+                return None
                 
             # ツイートURLをknown URLとして関連付け（常に実行）
             if tweet_url:
-                logger.info(f"Associating URL to file: {tweet_url}")
+                logger.info("Associating URL to file: %s", tweet_url)
                 await self.associate_url(file_hash, tweet_url)
-                
-            # タグを生成（既存ファイルでも常に実行）
-            logger.info(f"Generating tags for tweet {tweet_id}")
-            tags = self._generate_tags(tweet_data)
-            logger.info(f"Generated tags: {tags}")
             
             # タグを追加（既存ファイルでも常に実行）
-            logger.info(f"Adding tags to file {file_hash}")
+            result = None
+            logger.info("Adding tags to file %s", file_hash)
             if await self.add_tags(file_hash, tags):
-                imported.append((image_path, file_hash))
-                logger.info(f"Successfully added tags to file: {file_hash}")
+                result = (image_path, file_hash)
+                logger.info("Successfully added tags to file: %s", file_hash)
             else:
-                logger.error(f"Failed to add tags to file {file_hash}")
+                logger.error("Failed to add tags to file %s", file_hash)
                 
             # ツイート全文をnoteとして追加
-            tweet_text = tweet_data.get('content') or tweet_data.get('text', '')
-            if tweet_text:
-                # URLを除去してクリーンなテキストにする（改行は維持）
-                cleaned_text = tweet_text.strip()
-                # タブを空白に置換
-                cleaned_text = cleaned_text.replace('\t', ' ')
-                # t.coリンクを除去（TwitterのURL短縮）
-                cleaned_text = re.sub(r'https?://t\.co/\S+', '', cleaned_text).strip()
-                # 各行の前後の空白を削除
-                lines = [line.strip() for line in cleaned_text.split('\n')]
-                # 空行を削除して結合
-                cleaned_text = '\n'.join(line for line in lines if line)
-                
-                if cleaned_text:
-                    logger.info(f"Adding cleaned tweet text as note")
-                    await self.add_note(file_hash, "twitter description", cleaned_text)
-                
-        return imported
+            if cleaned_text:
+                logger.info("Adding cleaned tweet text as note")
+                await self.add_note(file_hash, "twitter description", cleaned_text)
+            
+            return result
+    
+    @staticmethod
+    def _clean_note_text(tweet_text: str) -> str:
+        """note用にツイート本文からt.coリンクと余分な空白を除去（改行は維持）"""
+        if not tweet_text:
+            return ''
+        # タブを空白に置換し、t.coリンクを除去（TwitterのURL短縮）
+        cleaned_text = _TCO_RE.sub('', tweet_text.translate(_TAB_TO_SPACE))
+        # 各行の前後の空白と空行を一度に除去
+        return _LINE_BREAK_RE.sub('\n', cleaned_text).strip()
     
     def _generate_tags(self, tweet_data: Dict[str, Any]) -> List[str]:
+        """ツイートデータからタグを生成（同一ツイートの再インポート時はキャッシュを使用）"""
+        event_info = tweet_data.get('event_info') or {}
+        cache_key = (
+            tweet_data.get('id'),
+            tweet_data.get('content') or tweet_data.get('text', ''),
+            tweet_data.get('display_name', ''),
+            tweet_data.get('username', ''),
+            str(tweet_data.get('created_at')),
+            tuple(event_info.get('detected_events', [])),
+            tuple(event_info.get('detected_keywords', [])),
+        )
+        cached = self._tag_cache.get(cache_key)
+        if cached is None:
+            cached = self._build_tags(tweet_data)
+            if len(self._tag_cache) >= self._TAG_CACHE_SIZE:
+                # 最も古いエントリを削除（dictは挿入順を保持）
+                del self._tag_cache[next(iter(self._tag_cache))]
+            self._tag_cache[cache_key] = cached
+        return list(cached)
+    
+    def _build_tags(self, tweet_data: Dict[str, Any]) -> List[str]:
         """ツイートデータからタグを生成"""
         tags = []
-        logger.debug(f"Generating tags for tweet {tweet_data.get('id')}: {tweet_data.get('content', '')[:50]}...")
-        logger.debug(f"Tweet data keys: {list(tweet_data.keys())}")
+        logger.debug("Generating tags for tweet %s: %s...", tweet_data.get('id'), tweet_data.get('content', '')[:50])
+        logger.debug("Tweet data keys: %s", list(tweet_data.keys()))
         
         # 基本タグ
-        tags.extend(self.tag_settings.get('base_tags', []))
+        tags.extend(self._base_tags)
         
         # クリエイター名タグ（usernameとdisplay_name両方）
-        creator_format = self.tag_settings.get('creator_tag_format', 'creator:{name}')
+        creator_tag = self._creator_tag
         
         # display_nameでタグ追加
         display_name = tweet_data.get('display_name', '')
         if display_name:
-            tags.append(creator_format.format(name=display_name))
+            tags.append(creator_tag(display_name))
         
         # usernameでもタグ追加（display_nameと異なる場合）
         username = tweet_data.get('username', '')
         if username and username != display_name:
-            tags.append(creator_format.format(name=username))
+            tags.append(creator_tag(username))
         
         # タイトルタグ（ツイート本文）
-        include_title = self.tag_settings.get('include_title_tag', True)
-        logger.debug(f"include_title_tag setting: {include_title}")
+        include_title = self._include_title_tag
+        logger.debug("include_title_tag setting: %s", include_title)
         if include_title:
             # contentまたはtextフィールドを確認
             tweet_text = tweet_data.get('content') or tweet_data.get('text', '')
-            logger.debug(f"Tweet text for title tag: {tweet_text[:100] if tweet_text else 'EMPTY'}")
+            logger.debug("Tweet text for title tag: %s", tweet_text[:100] if tweet_text else 'EMPTY')
             if tweet_text:
-                # t.coリンクを除去（TwitterのURL短縮）
-                cleaned_text = re.sub(r'https?://t\.co/\S+', '', tweet_text).strip()
+                first_line = _title_from_text(tweet_text)
                 
-                if cleaned_text:
-                    # 最初の行のみを取得（改行で分割して最初の要素）
-                    first_line = cleaned_text.split('\n')[0].strip()
-                    # タブを空白に置換
-                    first_line = first_line.replace('\t', ' ')
-                    # 連続する空白を1つに圧縮
-                    first_line = ' '.join(first_line.split())
-                    # 最初の行が長すぎる場合は100文字で切る
-                    if len(first_line) > 100:
-                        first_line = first_line[:97] + "..."
-                    
+                if first_line:
                     title_tag = f"title:{first_line}"
                     tags.append(title_tag)
-                    logger.debug(f"Added title tag: {title_tag}")
+                    logger.debug("Added title tag: %s", title_tag)
                 else:
                     logger.warning("Cleaned text is empty after processing")
             else:
-                logger.warning(f"No content/text found in tweet data for tweet {tweet_data.get('id')}")
+                logger.warning("No content/text found in tweet data for tweet %s", tweet_data.get('id'))
         
         # 日付タグ（config.yamlで無効化されていない場合のみ）
-        if self.tag_settings.get('include_date_tag', False):
-            date_format = self.tag_settings.get('date_tag_format', 'date:{date}')
+        if self._include_date_tag:
             created_at = tweet_data.get('created_at')
             if created_at:
                 if isinstance(created_at, str):
                     try:
                         dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
                         date_str = dt.strftime('%Y-%m-%d')
-                        tags.append(date_format.format(date=date_str))
+                        tags.append(self._date_tag(date_str))
                     except:
                         pass
         
@@ -389,29 +552,29 @@ class HydrusClient:
         event_info = tweet_data.get('event_info', {})
         
         # イベント名タグ
-        event_format = self.tag_settings.get('event_tag_format', 'event:{name}')
+        event_tag = self._event_tag
         detected_events = event_info.get('detected_events', [])
         for event in detected_events:
             if event:
-                tags.append(event_format.format(name=event))
+                tags.append(event_tag(event))
         
         # 検出されたキーワード
-        if self.tag_settings.get('include_detected_keywords', True):
+        if self._include_detected_keywords:
             keywords = event_info.get('detected_keywords', [])
             for keyword in keywords:
                 if keyword:
                     tags.append(f"keyword:{keyword}")
         
-        # 重複を削除
-        unique_tags = list(set(tags))
+        # 重複を削除（順序を維持し、空のタグは除外）
+        unique_tags = list(dict.fromkeys(t for t in tags if t))
         # タグ数をログに記録（デバッグ用）
         if unique_tags:
-            logger.info(f"Generated {len(unique_tags)} tags for tweet")
-            logger.info(f"All tags: {unique_tags}")
+            logger.info("Generated %s tags for tweet", len(unique_tags))
+            logger.info("All tags: %s", unique_tags)
             # title:タグが含まれているかチェック
-            title_tags = [tag for tag in unique_tags if tag.startswith('title:')]
-            if title_tags:
-                logger.info(f"Title tag included: {title_tags[0][:100]}...")
+            title_tag = _find_title_tag(unique_tags)
+            if title_tag:
+                logger.info("Title tag included: %s...", title_tag[:100])
             else:
                 logger.warning("No title tag generated for this tweet")
         return unique_tags
@@ -420,34 +583,67 @@ class HydrusClient:
         """ファイルのSHA256ハッシュを計算"""
         sha256_hash = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
+            for byte_block in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
     
+    async def _get_metadata(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        ファイルのメタデータを取得（短時間のキャッシュ付き）
+        
+        Args:
+            file_hash: ファイルのSHA256ハッシュ
+            
+        Returns:
+            メタデータのdict（Hydrusに記録がない場合は空dict）、APIエラー時はNone
+        """
+        cached = self._metadata_cache.get(file_hash)
+        if cached is not None and time.monotonic() - cached[0] < self._METADATA_CACHE_TTL:
+            return cached[1]
+        
+        # ハッシュは16進文字列のためエスケープ不要（paramsのdict生成・エンコードを省略）
+        async with self.session.get(
+            self._metadata_url + file_hash,
+            headers=self._headers
+        ) as resp:
+            if resp.status != 200:
+                logger.error("メタデータ取得APIエラー: %s", resp.status)
+                return None
+            data = _json_loads(await resp.read())
+        
+        metadata = data['metadata'][0] if data.get('metadata') else {}
+        now = time.monotonic()
+        # 取得し直したエントリは末尾に入れ直し、dictの挿入順を取得時刻順に保つ
+        self._metadata_cache.pop(file_hash, None)
+        if len(self._metadata_cache) >= self._METADATA_CACHE_SIZE:
+            # 期限切れのエントリを破棄
+            self._metadata_cache = {
+                h: entry for h, entry in self._metadata_cache.items()
+                if now - entry[0] < self._METADATA_CACHE_TTL
+            }
+            # それでも上限以上なら最も古いエントリから削除
+            while len(self._metadata_cache) >= self._METADATA_CACHE_SIZE:
+                del self._metadata_cache[next(iter(self._metadata_cache))]
+        self._metadata_cache[file_hash] = (now, metadata)
+        return metadata
+    
+    def _invalidate_metadata(self, file_hash: Optional[str]):
+        """タグ追加・削除解除などで内容が変わったファイルのメタデータキャッシュを破棄"""
+        if file_hash:
+            self._metadata_cache.pop(file_hash, None)
+    
     async def _check_file_exists(self, file_hash: str) -> bool:
         """ファイルがHydrusに既に存在するかチェック"""
         try:
-            headers = self._get_headers()
-            params = {'hash': file_hash}
-            
-            async with self.session.get(
-                f"{self.api_url}/get_files/file_metadata",
-                headers=headers,
-                params=params
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get('metadata'):
-                        # メタデータが存在する場合、実際にローカルに存在するかチェック
-                        metadata = data['metadata'][0]
-                        is_local = metadata.get('is_local', False)
-                        if not is_local:
-                            logger.debug(f"ファイルメタデータは存在するが、ローカルには存在しない: {file_hash}")
-                            return False  # ローカルに存在しない場合は再インポート
-                        return True
-                    return False
-                else:
-                    return False
+            metadata = await self._get_metadata(file_hash)
+            if metadata:
+                # メタデータが存在する場合、実際にローカルに存在するかチェック
+                is_local = metadata.get('is_local', False)
+                if not is_local:
+                    logger.debug("ファイルメタデータは存在するが、ローカルには存在しない: %s", file_hash)
+                    return False  # ローカルに存在しない場合は再インポート
+                return True
+            return False
         except:
             return False
     
@@ -458,71 +654,58 @@ class HydrusClient:
             (ファイルが存在するか, メタデータがあるか)
         """
         try:
-            headers = self._get_headers()
-            params = {'hash': file_hash}
-            
-            async with self.session.get(
-                f"{self.api_url}/get_files/file_metadata",
-                headers=headers,
-                params=params
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get('metadata'):
-                        metadata = data['metadata'][0]
-                        is_local = metadata.get('is_local', False)
-                        
-                        if not is_local:
-                            logger.debug(f"ファイルメタデータは存在するが、ローカルには存在しない: {file_hash}")
-                            return (False, False)
-                        
-                        # タグの存在をチェック
-                        service_keys_to_tags = metadata.get('service_keys_to_statuses_to_display_tags', {})
-                        has_tags = False
-                        
-                        if self.tag_service_key in service_keys_to_tags:
-                            tag_data = service_keys_to_tags[self.tag_service_key]
-                            current_tags = tag_data.get('0', [])
-                            # EventMonitor由来のタグがあるかチェック
-                            eventmonitor_tags = [tag for tag in current_tags if 'eventmonitor' in tag.lower() or 'creator:' in tag or 'title:' in tag]
-                            has_tags = len(eventmonitor_tags) > 0
-                            
-                            if has_tags:
-                                logger.debug(f"ファイルには既にEventMonitorのタグが存在します: {len(eventmonitor_tags)}個")
-                            else:
-                                logger.debug(f"ファイルは存在しますが、EventMonitorのタグがありません")
-                        
-                        return (True, has_tags)
-                    return (False, False)
-                else:
+            metadata = await self._get_metadata(file_hash)
+            if metadata:
+                is_local = metadata.get('is_local', False)
+                
+                if not is_local:
+                    logger.debug("ファイルメタデータは存在するが、ローカルには存在しない: %s", file_hash)
                     return (False, False)
+                
+                # タグの存在をチェック
+                service_keys_to_tags = metadata.get('service_keys_to_statuses_to_display_tags', {})
+                has_tags = False
+                
+                if self.tag_service_key in service_keys_to_tags:
+                    tag_data = service_keys_to_tags[self.tag_service_key]
+                    current_tags = tag_data.get('0', [])
+                    # EventMonitor由来のタグがあるかチェック
+                    eventmonitor_tags = [tag for tag in current_tags if 'eventmonitor' in tag.lower() or 'creator:' in tag or 'title:' in tag]
+                    has_tags = len(eventmonitor_tags) > 0
+                    
+                    if has_tags:
+                        logger.debug("ファイルには既にEventMonitorのタグが存在します: %s個", len(eventmonitor_tags))
+                    else:
+                        logger.debug("ファイルは存在しますが、EventMonitorのタグがありません")
+                
+                return (True, has_tags)
+            return (False, False)
         except Exception as e:
-            logger.error(f"ファイル存在チェックエラー: {e}")
+            logger.error("ファイル存在チェックエラー: %s", e)
             return (False, False)
     
     async def _undelete_file(self, file_hash: str) -> bool:
         """削除されたファイルを復元"""
         try:
-            headers = self._get_headers()
-            headers['Content-Type'] = 'application/json'
+            headers = self._json_headers
             
-            data = {
-                'hashes': [file_hash]
-            }
+            # 固定形のボディはハッシュ部分のみシリアライズして組み立てる
+            data = b'{"hashes": [' + _json_dumps(file_hash) + b']}'
             
             async with self.session.post(
-                f"{self.api_url}/add_files/undelete_files",
+                self._undelete_url,
                 headers=headers,
-                json=data
+                data=data
             ) as resp:
                 if resp.status == 200:
-                    logger.info(f"ファイルの削除を解除しました: {file_hash}")
+                    self._invalidate_metadata(file_hash)
+                    logger.info("ファイルの削除を解除しました: %s", file_hash)
                     return True
                 else:
-                    logger.error(f"削除解除APIエラー: {resp.status}")
+                    logger.error("削除解除APIエラー: %s", resp.status)
                     return False
         except Exception as e:
-            logger.error(f"削除解除エラー: {e}")
+            logger.error("削除解除エラー: %s", e)
             return False
     
     async def _get_file_tags(self, file_hash: str) -> Optional[List[str]]:
@@ -536,36 +719,24 @@ class HydrusClient:
             タグのリスト、失敗時はNone
         """
         try:
-            headers = self._get_headers()
-            params = {'hash': file_hash}
+            metadata = await self._get_metadata(file_hash)
+            if metadata is None:
+                return None
             
-            async with self.session.get(
-                f"{self.api_url}/get_files/file_metadata",
-                headers=headers,
-                params=params
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get('metadata'):
-                        metadata = data['metadata'][0]
-                        # サービスキーからタグを取得
-                        service_keys_to_tags = metadata.get('service_keys_to_statuses_to_display_tags', {})
-                        all_tags = []
-                        
-                        # local tagsサービスのタグを取得
-                        if self.tag_service_key in service_keys_to_tags:
-                            tag_data = service_keys_to_tags[self.tag_service_key]
-                            # 現在のタグ（status 0）を取得
-                            current_tags = tag_data.get('0', [])
-                            all_tags.extend(current_tags)
-                        
-                        return all_tags
-                    return []
-                else:
-                    logger.error(f"タグ取得APIエラー: {resp.status}")
-                    return None
+            # サービスキーからタグを取得
+            service_keys_to_tags = metadata.get('service_keys_to_statuses_to_display_tags', {})
+            all_tags = []
+            
+            # local tagsサービスのタグを取得
+            if self.tag_service_key in service_keys_to_tags:
+                tag_data = service_keys_to_tags[self.tag_service_key]
+                # 現在のタグ（status 0）を取得
+                current_tags = tag_data.get('0', [])
+                all_tags.extend(current_tags)
+            
+            return all_tags
         except Exception as e:
-            logger.error(f"タグ取得エラー: {e}")
+            logger.error("タグ取得エラー: %s", e)
             return None
     
     async def add_note(self, file_hash: str, note_name: str, note_text: str) -> bool:
@@ -584,8 +755,7 @@ class HydrusClient:
             return False
             
         try:
-            headers = self._get_headers()
-            headers['Content-Type'] = 'application/json'
+            headers = self._json_headers
             
             data = {
                 'hash': file_hash,
@@ -597,19 +767,19 @@ class HydrusClient:
             async with self.session.post(
                 f"{self.api_url}/add_notes/set_notes",
                 headers=headers,
-                json=data
+                data=_json_dumps(data)
             ) as resp:
                 if resp.status == 200:
-                    logger.info(f"noteを追加しました: {note_name}")
+                    logger.info("noteを追加しました: %s", note_name)
                     return True
                 else:
-                    logger.error(f"note追加APIエラー: {resp.status}")
+                    logger.error("note追加APIエラー: %s", resp.status)
                     error_text = await resp.text()
-                    logger.error(f"エラー詳細: {error_text}")
+                    logger.error("エラー詳細: %s", error_text)
                     return False
                     
         except Exception as e:
-            logger.error(f"note追加エラー: {e}")
+            logger.error("note追加エラー: %s", e)
             return False
     
     async def associate_url(self, file_hash: str, url: str) -> bool:
@@ -627,8 +797,7 @@ class HydrusClient:
             return False
             
         try:
-            headers = self._get_headers()
-            headers['Content-Type'] = 'application/json'
+            headers = self._json_headers
             
             data = {
                 'hash': file_hash,
@@ -638,15 +807,15 @@ class HydrusClient:
             async with self.session.post(
                 f"{self.api_url}/add_urls/associate_url",
                 headers=headers,
-                json=data
+                data=_json_dumps(data)
             ) as resp:
                 if resp.status == 200:
-                    logger.info(f"URLを関連付けました: {url}")
+                    logger.info("URLを関連付けました: %s", url)
                     return True
                 else:
-                    logger.error(f"URL関連付けAPIエラー: {resp.status}")
+                    logger.error("URL関連付けAPIエラー: %s", resp.status)
                     return False
                     
         except Exception as e:
-            logger.error(f"URL関連付けエラー: {e}")
+            logger.error("URL関連付けエラー: %s", e)
             return False
\ No newline at end of file
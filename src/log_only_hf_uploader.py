@@ -1,22 +1,82 @@
+import io
+import hashlib
 import logging
 import json
 import os
+import random
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
-from huggingface_hub import HfApi, upload_file, create_repo
+from typing import List, Dict, Any, Optional
+from huggingface_hub import HfApi, upload_file, create_repo, CommitOperationAdd
+from huggingface_hub import constants as hf_constants
+from huggingface_hub.utils import HfHubHTTPError
 import tempfile
 import aiohttp
 import asyncio
 import time
 import re
+import shutil
+import uuid
 import yaml
+from urllib.parse import urlparse
 from .rclone_client import RcloneClient, RcloneConfig
 
+# hf_transferがあれば大きなファイルのアップロードをRust実装の並列アップローダーに切り替える
+try:
+    import hf_transfer  # noqa: F401
+    HAS_HF_TRANSFER = True
+except ImportError:
+    HAS_HF_TRANSFER = False
+
+# libyamlのCバインディングがあればconfig.yamlの読み書きに使う
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+# ダウンロード時にディスクへ書き込むチャンクサイズ
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# gallery-dlでダウンロード済みのファイルを動画として扱う拡張子
+_VIDEO_EXTS = frozenset({
+    '.mp4', '.mov', '.avi', '.webm', '.mkv', '.flv', '.wmv',
+    '.m4v', '.mpg', '.mpeg', '.3gp', '.3g2', '.ts', '.vob',
+    '.ogv', '.f4v', '.asf', '.rm', '.rmvb', '.m2ts', '.mts',
+    '.m3u8', '.m3u', '.gif', '.gifv'
+})
+
+# ツイートのメディアURLから判定する有効な拡張子
+_VALID_IMAGE_EXTS = frozenset({'jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp'})
+_VALID_VIDEO_EXTS = frozenset({'mp4', 'mov', 'avi', 'webm', 'mkv', 'flv', 'wmv', 'm4v', 'gif', 'm3u8'})
+
+# レート制限エラーメッセージから待機時間を抽出するパターン
+_RATE_LIMIT_PAT1 = re.compile(r'retry this action in about (\d+) (hour|minute)')
+_RATE_LIMIT_PAT2 = re.compile(r'you can retry this action in (\d+) (minutes?|hours?)')
+
+# リポジトリ名の末尾の番号（例: "Sageen/EventMonitor_1"）を分離するパターン
+_REPO_SUFFIX_PAT = re.compile(r'^(.+?)(_\d+)?$')
+_REPO_NUMBER_PAT = re.compile(r'^(.+?)(?:_(\d+))?$')
+
+
+def _parse_media_ext(url: str, default_ext: str, valid_exts: frozenset) -> str:
+    """メディアURLから拡張子を判定（URLパラメータ ?format=jpg&name=orig などは除外してパスから取得）"""
+    ext = os.path.splitext(urlparse(url).path)[1].lstrip('.').lower()
+    return ext if ext in valid_exts else default_ext
+
 
 class LogOnlyHFUploader:
     """ログ専用アカウント用のHugging Faceアップローダー"""
     
+    @property
+    def full_repo_name(self) -> str:
+        return self._full_repo_name
+    
+    @full_repo_name.setter
+    def full_repo_name(self, value: str):
+        # リポジトリ切り替え時にHF URLのベース部分も作り直す
+        self._full_repo_name = value
+        self._resolve_base = f"https://huggingface.co/datasets/{value}/resolve/main"
+    
     def __init__(self, config: dict, db_manager=None, backup_manager=None):
         self.config = config
         self.logger = logging.getLogger("EventMonitor.LogOnlyHF")
@@ -29,7 +89,18 @@ class LogOnlyHFUploader:
         self.upload_queue = []  # アップロード待ちのファイル
         self.last_upload_time = 0
         self.batch_upload_interval = 300  # バッチアップロードの間隔（5分）
-        self.max_concurrent_uploads = 3  # 同時アップロード数の制限
+        # メディアダウンロード用のHTTPセッション（初回使用時に作成し、close()で閉じる）
+        self._session: Optional[aiohttp.ClientSession] = None
+        # 1コミットにまとめてアップロードする待機中の操作と、コミット後に削除する暗号化ファイル
+        self._pending_ops: List[CommitOperationAdd] = []
+        self._pending_cleanup: List[Path] = []
+        # コミット待ちファイルの内容ハッシュ（HF上のパス→SHA-256）と、
+        # 同じ内容のアップロード済みURLを再利用したファイル（HF上のパス→HF URL）
+        self._pending_hashes: Dict[str, str] = {}
+        self._reused_urls: Dict[str, str] = {}
+        # config.yamlの読み込みキャッシュ（更新時刻が変わったときだけ再パース）
+        self._config_mtime = 0
+        self._cached_config: Optional[dict] = None
         self.log_only_config = config.get('log_only_accounts', {})
         
         # 機能が有効かチェック
@@ -41,6 +112,8 @@ class LogOnlyHFUploader:
         self.enabled = True
         self.delete_after_upload = self.log_only_config.get('delete_after_upload', True)
         self.batch_size = self.log_only_config.get('batch_size', 50)
+        self.tweet_concurrency = self.log_only_config.get('tweet_concurrency', 5)
+        self.download_concurrency = self.log_only_config.get('download_concurrency', 8)
         
         # アップロードモード設定
         self.upload_mode = self.log_only_config.get('upload_mode', 'immediate')
@@ -58,7 +131,27 @@ class LogOnlyHFUploader:
                 self.enabled = False
                 return
             
+            # hf_transferを有効化（未インストール時に有効化するとアップロードがエラーになるため確認する）
+            if self.log_only_config.get('hf_transfer_enabled', True) and HAS_HF_TRANSFER:
+                os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+                # huggingface_hubはインポート時に環境変数を読むため定数も更新する
+                # （環境変数で明示的に無効化されている場合はそれに従う）
+                hf_constants.HF_HUB_ENABLE_HF_TRANSFER = (
+                    os.environ["HF_HUB_ENABLE_HF_TRANSFER"].upper() in hf_constants.ENV_VARS_TRUE_VALUES
+                )
+                if hf_constants.HF_HUB_ENABLE_HF_TRANSFER:
+                    self.logger.info("Enabled hf_transfer for log-only HF uploads")
+            
+            # Xetストレージへのアップロードで並列度を上げる（CPU・メモリを多く使うため既定では無効）
+            if self.log_only_config.get('hf_xet_high_performance', False):
+                os.environ.setdefault("HF_XET_HIGH_PERFORMANCE", "1")
+                if hasattr(hf_constants, 'HF_XET_HIGH_PERFORMANCE'):
+                    hf_constants.HF_XET_HIGH_PERFORMANCE = (
+                        os.environ["HF_XET_HIGH_PERFORMANCE"].upper() in hf_constants.ENV_VARS_TRUE_VALUES
+                    )
+            
             self.api = HfApi(token=token)
+            self._token = token
             
             # メインのバックアップ設定と同じリポジトリ名を使用
             hf_backup_config = config.get('huggingface_backup', {})
@@ -79,8 +172,9 @@ class LogOnlyHFUploader:
             
             self.logger.info(f"Initialized log-only HF uploader for {self.full_repo_name}")
             
-            # リポジトリの作成（存在しない場合）
-            self._ensure_repo_exists()
+            # リポジトリの存在確認・作成は初回アップロード時に行う（_ensure_ready）
+            # 確認済みのリポジトリ名を記録し、同じリポジトリへの問い合わせを繰り返さない
+            self._ensured_repos: set = set()
             
             # rclone暗号化の初期化（通常のバックアップ設定から流用）
             self.rclone_client = None
@@ -101,18 +195,25 @@ class LogOnlyHFUploader:
     
     def _ensure_repo_exists(self):
         """リポジトリが存在することを確認（なければ作成）"""
+        if self.full_repo_name in self._ensured_repos:
+            return
+        
         try:
-            # リポジトリの存在確認
+            # 存在確認をせずに作成を試み、既存なら409が返る（1回の問い合わせで済ませる）
             try:
-                self.api.repo_info(self.full_repo_name, repo_type="dataset")
-                self.logger.debug(f"Repository {self.full_repo_name} already exists")
-            except:
-                # リポジトリが存在しない場合は作成
                 self.api.create_repo(
                     repo_id=self.full_repo_name,
-                    repo_type="dataset",
-                    exist_ok=True  # 既存のリポジトリがあってもOK
+                    repo_type="dataset"
                 )
+            except HfHubHTTPError as e:
+                status_code = e.response.status_code if e.response is not None else None
+                if status_code == 403:
+                    # リポジトリ作成権限のないトークンは403になるため、既存かどうかを確認する
+                    self.api.repo_info(self.full_repo_name, repo_type="dataset")
+                elif status_code != 409:
+                    raise
+                self.logger.debug(f"Repository {self.full_repo_name} already exists")
+            else:
                 self.logger.info(f"Created new dataset repository: {self.full_repo_name}")
                 
                 # README.mdを作成（メインリポジトリ用に内容を更新）
@@ -127,64 +228,86 @@ This repository contains data from the EventMonitor system.
 
 Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
-                readme_path = Path("temp_readme.md")
-                readme_path.write_text(readme_content)
-                
+                # 一時ファイルを作らずメモリ上の内容をそのままアップロード
                 upload_file(
-                    path_or_fileobj=str(readme_path),
+                    path_or_fileobj=io.BytesIO(readme_content.encode('utf-8')),
                     path_in_repo="README.md",
                     repo_id=self.full_repo_name,
                     repo_type="dataset",
-                    token=self.api.token
+                    token=self._token
                 )
-                
-                readme_path.unlink()
+            
+            self._ensured_repos.add(self.full_repo_name)
                 
         except Exception as e:
             self.logger.error(f"Failed to ensure repository exists: {e}")
             raise
     
+    async def _ensure_ready(self) -> bool:
+        """リポジトリごとに初回のみ存在を確認（なければ作成）し、利用可能かを返す"""
+        if self.full_repo_name in self._ensured_repos:
+            return True
+        
+        try:
+            await asyncio.to_thread(self._ensure_repo_exists)
+        except Exception as e:
+            self.logger.error(f"Failed to initialize log-only HF uploader: {e}")
+            self.enabled = False
+            return False
+        
+        return True
+    
     def _extract_base_repo_name(self, repo_name: str) -> str:
         """リポジトリ名から番号を除いたベース名を抽出"""
         # 例: "Sageen/EventMonitor_1" → "Sageen/EventMonitor"
-        match = re.match(r'^(.+?)(_\d+)?$', repo_name)
+        match = _REPO_SUFFIX_PAT.match(repo_name)
         if match:
             return match.group(1)
         return repo_name
     
     def _get_next_repo_name(self) -> str:
         """現在のリポジトリ名から次の番号のリポジトリ名を生成"""
-        match = re.match(r'^(.+?)(?:_(\d+))?$', self.full_repo_name)
+        match = _REPO_NUMBER_PAT.match(self.full_repo_name)
         if match:
             base_name = match.group(1)
             current_num = int(match.group(2)) if match.group(2) else 1
             return f"{base_name}_{current_num + 1}"
         return f"{self.full_repo_name}_2"
     
+    def _read_config_file(self, config_path: Path) -> dict:
+        """config.yamlを読み込む（前回から更新されていなければキャッシュを返す）"""
+        mtime = config_path.stat().st_mtime_ns
+        if self._cached_config is None or mtime != self._config_mtime:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                self._cached_config = yaml.load(f, Loader=_YamlLoader)
+            self._config_mtime = mtime
+        return self._cached_config
+    
     def _update_config_file(self, new_repo_name: str):
         """config.yamlファイルを新しいリポジトリ名で更新"""
         try:
             config_path = Path('config.yaml')
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            config = self._read_config_file(config_path)
             
             # リポジトリ名を更新
             config['huggingface_backup']['repo_name'] = new_repo_name
             
             # ファイルに書き戻す
             with open(config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+                yaml.dump(config, f, Dumper=_YamlDumper, default_flow_style=False, allow_unicode=True, sort_keys=False)
             
             self.logger.info(f"Updated config.yaml with new repository: {new_repo_name}")
         except Exception as e:
             self.logger.error(f"Failed to update config.yaml: {e}")
+        finally:
+            # キャッシュを書き換えたため、次回はファイルから読み直す
+            self._cached_config = None
     
     def _reload_repo_name_from_config(self):
         """config.yamlから最新のリポジトリ名を再読み込み"""
         try:
             config_path = Path('config.yaml')
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            config = self._read_config_file(config_path)
             
             new_repo_name = config.get('huggingface_backup', {}).get('repo_name', self.repo_name)
             
@@ -219,92 +342,156 @@ Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                 self.logger.info(f"Using BackupManager's repository: {self.backup_manager.full_repo_name}")
                 self.full_repo_name = self.backup_manager.full_repo_name
         
+        if not await self._ensure_ready():
+            return
+        
         total_files = sum(len(files) for files in media_paths.values())
         self.logger.info(f"Processing {total_files} files from {len(media_paths)} tweets")
         
         processed_count = 0
         failed_count = 0
+        # (ツイートID, 元ファイル, HF上のパス) の組。元ファイルはコミット成功後に削除する
+        queued_files = []
+        uploaded_urls: Dict[str, str] = {}
         
-        for tweet_id, file_paths in media_paths.items():
-            # DBから処理済みかチェック
-            if self.db_manager:
-                existing_urls = self.db_manager.get_log_only_tweet_hf_urls(tweet_id)
-                if existing_urls:
-                    self.logger.debug(f"Tweet {tweet_id} already uploaded to HF, skipping")
-                    # 既にアップロード済みなら、ファイルだけ削除
-                    for file_path in file_paths:
-                        try:
-                            Path(file_path).unlink()
-                            self.logger.debug(f"Deleted already-uploaded file: {file_path}")
-                        except Exception as e:
-                            self.logger.error(f"Failed to delete file {file_path}: {e}")
-                    continue
+        # 処理済みツイートのHF URLを1クエリでまとめて取得
+        existing_hf_urls = {}
+        if self.db_manager:
+            existing_hf_urls = self.db_manager.get_log_only_tweet_hf_urls_bulk(list(media_paths))
+        
+        # ツイート単位で並行処理（同時処理数はセマフォで制限）
+        tweet_sem = asyncio.Semaphore(self.tweet_concurrency)
+        tasks = [
+            asyncio.create_task(self._queue_downloaded_media(
+                tweet_id, file_paths, username, tweet_sem, existing_hf_urls.get(tweet_id)
+            ))
+            for tweet_id, file_paths in media_paths.items()
+        ]
+        
+        for future in asyncio.as_completed(tasks):
+            queued, failed = await future
+            queued_files.extend(queued)
+            failed_count += failed
             
-            hf_urls = []
+            # 一定数たまったら1コミットでアップロード（他のツイートの処理は継続）
+            if len(self._pending_ops) >= self.batch_size:
+                uploaded_urls.update(await self._flush_uploads())
+        
+        # 残りをアップロード
+        uploaded_urls.update(await self._flush_uploads())
+        
+        # コミットに成功したファイルのみURLを記録し、元ファイルを削除
+        hf_urls_by_tweet: Dict[str, List[str]] = {}
+        uploaded_files = []
+        for tweet_id, file_path, hf_path in queued_files:
+            hf_url = uploaded_urls.get(hf_path)
+            if hf_url is None:
+                failed_count += 1
+                self.logger.error(f"Failed to upload {file_path.name}")
+                continue
+            
+            hf_urls_by_tweet.setdefault(tweet_id, []).append(hf_url)
+            processed_count += 1
+            uploaded_files.append(file_path)
+        
+        # 削除はストレージによって時間がかかるためスレッドでまとめて実行
+        await asyncio.to_thread(self._delete_files, uploaded_files)
+        
+        # DBにHF URLをまとめて保存
+        if self.db_manager and hf_urls_by_tweet:
+            self.db_manager.update_log_only_tweet_hf_urls_many(list(hf_urls_by_tweet.items()))
+            self.logger.debug(f"Updated DB for {len(hf_urls_by_tweet)} tweets")
+        
+        self.logger.info(f"Completed: {processed_count} uploaded, {failed_count} failed")
+    
+    async def _queue_downloaded_media(self, tweet_id: str, file_paths: List[str], username: str,
+                                      sem: asyncio.Semaphore,
+                                      existing_urls: Optional[List[str]] = None) -> tuple[List[tuple[str, Path, str]], int]:
+        """1ツイート分のダウンロード済みファイルをコミット待ちに追加し、(追加したファイル, 失敗数) を返す"""
+        async with sem:
+            # DBで処理済みの場合
+            if existing_urls:
+                self.logger.debug(f"Tweet {tweet_id} already uploaded to HF, skipping")
+                # 既にアップロード済みなら、ファイルだけ削除
+                await asyncio.to_thread(self._delete_files, file_paths)
+                self.logger.debug(f"Deleted {len(file_paths)} already-uploaded files for tweet {tweet_id}")
+                return [], 0
+            
+            queued = []
+            failed = 0
+            existing_paths = []
             for file_path in file_paths:
                 file_path = Path(file_path)
                 if not file_path.exists():
                     self.logger.warning(f"File not found: {file_path}")
                     continue
-                
+                existing_paths.append(file_path)
+            
+            # 内容ハッシュを計算し、同じ内容をアップロード済みのファイルは暗号化・アップロードしない
+            file_hashes = {}
+            if self.db_manager and existing_paths:
+                file_hashes = await asyncio.to_thread(self._hash_files, existing_paths)
+            to_upload = []
+            for file_path in existing_paths:
+                hf_path = self._downloaded_media_hf_path(file_path, username, tweet_id)
+                if self.rclone_client:
+                    hf_path += ".enc"
+                if await self._reuse_uploaded(hf_path, file_hashes.get(file_path)):
+                    queued.append((tweet_id, file_path, hf_path))
+                else:
+                    to_upload.append(file_path)
+            
+            # rclone暗号化が有効な場合、ツイート内のファイルを1回のrclone呼び出しでまとめて暗号化
+            encrypted_files = {}
+            if self.rclone_client and to_upload:
+                encrypted_files = await asyncio.to_thread(self._encrypt_files_for_upload, to_upload)
+            
+            for file_path in to_upload:
                 try:
-                    # ファイル名から判定（動画か画像か）
-                    is_video = file_path.suffix.lower() in {'.mp4', '.mov', '.avi', '.webm', '.mkv', '.flv', '.wmv', 
-                                                            '.m4v', '.mpg', '.mpeg', '.3gp', '.3g2', '.ts', '.vob',
-                                                            '.ogv', '.f4v', '.asf', '.rm', '.rmvb', '.m2ts', '.mts',
-                                                            '.m3u8', '.m3u', '.gif', '.gifv'}
+                    hf_path = self._downloaded_media_hf_path(file_path, username, tweet_id)
                     
-                    # HFパスを決定
-                    if is_video:
-                        hf_path = f"encrypted_videos/{username}/{tweet_id}/{file_path.name}"
+                    encrypted_path = encrypted_files.get(file_path.name)
+                    if encrypted_path:
+                        upload_path = str(encrypted_path)
+                        hf_path += ".enc"
                     else:
-                        hf_path = f"encrypted_images/{username}/{tweet_id}/{file_path.name}"
-                    
-                    # rclone暗号化が有効な場合
-                    upload_path = str(file_path)
-                    if self.rclone_client:
-                        encrypted_path = file_path.parent / f"{file_path.name}.enc"
-                        encrypted_path = self.rclone_client.encrypt_file(file_path, encrypted_path)
-                        if encrypted_path:
-                            upload_path = str(encrypted_path)
-                            hf_path += ".enc"
+                        upload_path = str(file_path)
                     
-                    # アップロード（リトライ機能付き）
-                    upload_success = await self._upload_with_retry(
-                        upload_path=upload_path,
-                        hf_path=hf_path
-                    )
-                    
-                    if upload_success:
-                        # HF URLを記録
-                        hf_url = f"https://huggingface.co/datasets/{self.full_repo_name}/resolve/main/{hf_path}"
-                        hf_urls.append(hf_url)
-                        processed_count += 1
-                        self.logger.debug(f"Uploaded and will delete: {file_path.name}")
-                        
-                        # 元ファイルを削除
-                        file_path.unlink()
-                        
-                        # 暗号化ファイルがある場合も削除
-                        if self.rclone_client and upload_path != str(file_path):
-                            Path(upload_path).unlink()
-                    else:
-                        failed_count += 1
-                        self.logger.error(f"Failed to upload {file_path.name}")
+                    # コミット待ちに追加（暗号化ファイルはコミット後に削除）
+                    await self._queue_upload(upload_path, hf_path, cleanup_path=encrypted_path,
+                                             sha256=file_hashes.get(file_path))
+                    queued.append((tweet_id, file_path, hf_path))
                         
                 except Exception as e:
                     self.logger.error(f"Error processing {file_path}: {e}")
-                    failed_count += 1
+                    failed += 1
             
-            # DBにHF URLを保存
-            if self.db_manager and hf_urls:
-                self.db_manager.update_log_only_tweet_hf_urls(tweet_id, hf_urls)
-                self.logger.debug(f"Updated DB for tweet {tweet_id} with {len(hf_urls)} URLs")
-        
-        self.logger.info(f"Completed: {processed_count} uploaded, {failed_count} failed")
+            return queued, failed
+    
+    @staticmethod
+    def _downloaded_media_hf_path(file_path: Path, username: str, tweet_id: str) -> str:
+        """ダウンロード済みファイルのHF上のパスを決定（ファイル名から動画か画像かを判定）"""
+        if file_path.suffix.lower() in _VIDEO_EXTS:
+            return f"encrypted_videos/{username}/{tweet_id}/{file_path.name}"
+        return f"encrypted_images/{username}/{tweet_id}/{file_path.name}"
+    
+    @staticmethod
+    def _hash_files(file_paths: List[Path]) -> Dict[Path, str]:
+        """ファイルのSHA-256を計算（同期処理、スレッドから呼び出す）"""
+        hashes = {}
+        for file_path in file_paths:
+            hasher = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+                    hasher.update(chunk)
+            hashes[file_path] = hasher.hexdigest()
+        return hashes
     
     async def process_tweets(self, tweets: List[Dict[str, Any]], username: str) -> List[Dict[str, Any]]:
-        """ツイートの画像をダウンロード、HFにアップロード、URLを更新"""
+        """ツイートの画像をダウンロード、HFにアップロード、URLを更新
+        
+        渡されたツイート辞書に huggingface_urls / uploaded_to_hf を直接設定して返す（コピーしない）
+        """
         if not self.enabled:
             return tweets
         
@@ -314,227 +501,323 @@ Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                 self.logger.info(f"Using BackupManager's repository: {self.backup_manager.full_repo_name}")
                 self.full_repo_name = self.backup_manager.full_repo_name
         
-        processed_tweets = []
+        # まず全ツイートをURLなしで初期化し、メディアを含むツイートだけを処理対象にする
+        media_tweets = []
+        for tweet in tweets:
+            tweet['huggingface_urls'] = []
+            tweet['uploaded_to_hf'] = False
+            if tweet.get('media') or tweet.get('videos'):
+                media_tweets.append(tweet)
+        
+        # メディアを含むツイートがなければ一時ディレクトリやセッションを作らない
+        if not media_tweets:
+            return tweets
+        
+        if not await self._ensure_ready():
+            return tweets
+        
+        # (ツイート, HF上のパス) の組。URLはコミット成功後に確定する
+        queued_paths = []
+        uploaded_urls: Dict[str, str] = {}
+        # メディアURL→処理タスク（リツイート等で同じメディアが複数回現れても1回だけ処理）
+        url_cache: Dict[str, asyncio.Task] = {}
         
         # 一時ディレクトリを作成
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            for tweet in tweets:
-                try:
-                    tweet_copy = tweet.copy()
-                    
-                    # 画像と動画がある場合の処理
-                    hf_urls = []
-                    
-                    if tweet_copy.get('media'):
-                        image_urls = await self._process_tweet_images(
-                            tweet_copy,
-                            username,
-                            temp_path
-                        )
-                        hf_urls.extend(image_urls)
-                    
-                    if tweet_copy.get('videos'):
-                        video_urls = await self._process_tweet_videos(
-                            tweet_copy,
-                            username,
-                            temp_path
-                        )
-                        hf_urls.extend(video_urls)
-                    
-                    tweet_copy['huggingface_urls'] = hf_urls
-                    tweet_copy['uploaded_to_hf'] = bool(hf_urls)
-                    
-                    # データベースを更新
-                    if self.db_manager and hf_urls:
-                        self.db_manager.update_log_only_tweet_hf_urls(tweet_copy['id'], hf_urls)
-                    
-                    processed_tweets.append(tweet_copy)
-                    
-                except Exception as e:
-                    self.logger.error(f"Failed to process tweet {tweet.get('id')}: {e}")
-                    # エラーが発生してもツイート自体は保存する
-                    tweet_copy = tweet.copy()
-                    tweet_copy['huggingface_urls'] = []
-                    tweet_copy['uploaded_to_hf'] = False
-                    processed_tweets.append(tweet_copy)
-        
-        return processed_tweets
-    
-    async def _process_tweet_images(self, tweet: Dict[str, Any], username: str, temp_dir: Path) -> List[str]:
-        """ツイートの画像をダウンロードしてHFにアップロード"""
-        hf_urls = []
-        
-        # 画像をダウンロード
-        async with aiohttp.ClientSession() as session:
-            for i, media_url in enumerate(tweet.get('media', [])):
-                try:
-                    # ファイル名を生成（URLパラメータを除去）
-                    # URLからファイル名部分を抽出
-                    if '/' in media_url:
-                        file_part = media_url.split('/')[-1]
-                    else:
-                        file_part = media_url
-                    
-                    # パラメータを除去（?format=jpg&name=orig など）
-                    if '?' in file_part:
-                        file_part = file_part.split('?')[0]
-                    
-                    # 拡張子を判定
-                    if '.' in file_part:
-                        ext = file_part.split('.')[-1]
-                    else:
-                        # 拡張子がない場合はjpgをデフォルトとする
-                        ext = 'jpg'
-                    
-                    # 有効な画像拡張子かチェック
-                    valid_image_extensions = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp']
-                    if ext.lower() not in valid_image_extensions:
-                        ext = 'jpg'  # 不明な拡張子の場合はjpgをデフォルト
-                    
-                    filename = f"{tweet['id']}_{i}.{ext}"
-                    local_path = temp_dir / filename
-                    
-                    # ダウンロード
-                    async with session.get(media_url) as response:
-                        if response.status == 200:
-                            content = await response.read()
-                            local_path.write_bytes(content)
-                            
-                            # HFにアップロード（通常のencrypted_imagesディレクトリに保存）
-                            hf_path = f"encrypted_images/{username}/{tweet['id']}/{filename}"
-                            
-                            # rclone暗号化が有効な場合
-                            if self.rclone_client:
-                                # rclone_clientのtemp_dir内にファイルをコピーしてから暗号化
-                                rclone_temp_path = self.rclone_client.temp_dir / filename
-                                rclone_temp_path.write_bytes(content)
-                                encrypted_filename = filename + '.enc'
-                                encrypted_path = self.rclone_client.encrypt_file(
-                                    rclone_temp_path, 
-                                    self.rclone_client.temp_dir / encrypted_filename
-                                )
-                                if encrypted_path:
-                                    upload_path = str(encrypted_path)
-                                    hf_path += ".enc"
-                                else:
-                                    upload_path = str(local_path)
-                                # 一時ファイルを削除
-                                if rclone_temp_path.exists():
-                                    rclone_temp_path.unlink()
-                            else:
-                                upload_path = str(local_path)
-                            
-                            # アップロード（リトライ機能付き）
-                            upload_success = await self._upload_with_retry(
-                                upload_path=upload_path,
-                                hf_path=hf_path
-                            )
-                            
-                            if upload_success:
-                                # HF URLを記録
-                                hf_url = f"https://huggingface.co/datasets/{self.full_repo_name}/resolve/main/{hf_path}"
-                                hf_urls.append(hf_url)
-                                
-                                self.logger.debug(f"Uploaded image to HF: {hf_path}")
-                            
-                            # 暗号化ファイルがある場合は削除
-                            if self.rclone_client and encrypted_path and Path(encrypted_path).exists():
-                                Path(encrypted_path).unlink()
-                                
-                except Exception as e:
-                    self.logger.error(f"Failed to process image {media_url}: {e}")
+            # 呼び出しをまたいで1つのHTTPセッション（接続プール）を共有
+            session = await self._get_session()
+            
+            # ツイート単位でも並行処理（同時処理数はセマフォで制限）
+            tweet_sem = asyncio.Semaphore(self.tweet_concurrency)
+            tasks = [
+                asyncio.create_task(
+                    self._process_one_tweet(session, tweet, username, temp_path, url_cache, tweet_sem)
+                )
+                for tweet in media_tweets
+            ]
+            
+            for future in asyncio.as_completed(tasks):
+                tweet, hf_paths = await future
+                queued_paths.append((tweet, hf_paths))
+                
+                # 一定数たまったら1コミットでアップロード（他のツイートの処理は継続）
+                if len(self._pending_ops) >= self.batch_size:
+                    uploaded_urls.update(await self._flush_uploads())
+            
+            # 残りをアップロード（一時ファイルが消える前に実行）
+            uploaded_urls.update(await self._flush_uploads())
+        
+        # コミットに成功したファイルのURLのみ記録
+        db_updates = []
+        for tweet, hf_paths in queued_paths:
+            hf_urls = [uploaded_urls[hf_path] for hf_path in hf_paths if hf_path in uploaded_urls]
+            if hf_urls:
+                tweet['huggingface_urls'] = hf_urls
+                tweet['uploaded_to_hf'] = True
+                db_updates.append((tweet['id'], hf_urls))
         
-        return hf_urls
+        # データベースをまとめて更新
+        if self.db_manager and db_updates:
+            self.db_manager.update_log_only_tweet_hf_urls_many(db_updates)
+        
+        return tweets
+    
+    async def _process_one_tweet(self, session: aiohttp.ClientSession, tweet: Dict[str, Any], username: str,
+                                 temp_dir: Path, url_cache: Dict[str, asyncio.Task],
+                                 sem: asyncio.Semaphore) -> tuple[Dict[str, Any], List[str]]:
+        """1ツイート分の画像・動画をコミット待ちに追加し、(ツイート, HF上のパス) を返す"""
+        async with sem:
+            hf_paths = []
+            try:
+                if tweet.get('media'):
+                    image_paths = await self._process_tweet_images(
+                        session,
+                        tweet,
+                        username,
+                        temp_dir,
+                        url_cache
+                    )
+                    hf_paths.extend(image_paths)
+                
+                if tweet.get('videos'):
+                    video_paths = await self._process_tweet_videos(
+                        session,
+                        tweet,
+                        username,
+                        temp_dir,
+                        url_cache
+                    )
+                    hf_paths.extend(video_paths)
+                
+            except Exception as e:
+                # エラーが発生してもツイート自体は保存する（URLなしとして扱う）
+                self.logger.error(f"Failed to process tweet {tweet.get('id')}: {e}")
+                hf_paths = []
+            
+            return tweet, hf_paths
     
-    async def _process_tweet_videos(self, tweet: Dict[str, Any], username: str, temp_dir: Path) -> List[str]:
-        """ツイートの動画をダウンロードしてHFにアップロード"""
-        hf_urls = []
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """メディアダウンロード用のHTTPセッションを取得（なければ作成）"""
+        if self._session is None or self._session.closed:
+            # 同時ダウンロード数は接続プールの上限で制限する
+            connector = aiohttp.TCPConnector(limit=self.download_concurrency, ttl_dns_cache=300)
+            # 大きな動画でも途中で打ち切らないよう、全体ではなく読み込み間隔でタイムアウトを設定
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+    
+    async def close(self):
+        """HTTPセッションを閉じる"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _download_to_file(self, session: aiohttp.ClientSession, url: str, local_path: Path,
+                                hasher=None) -> bool:
+        """URLの内容をチャンク単位でファイルに書き込む（成功時True）
+        
+        hasherを渡すと書き込んだ内容でハッシュを更新する
+        """
+        async with session.get(url) as response:
+            if response.status != 200:
+                return False
+            try:
+                with open(local_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        await asyncio.to_thread(f.write, chunk)
+            except BaseException:
+                # 途中で失敗した場合は書きかけのファイルを残さない
+                local_path.unlink(missing_ok=True)
+                raise
+        return True
+    
+    async def _process_tweet_images(self, session: aiohttp.ClientSession, tweet: Dict[str, Any],
+                                    username: str, temp_dir: Path,
+                                    url_cache: Dict[str, asyncio.Task]) -> List[str]:
+        """ツイートの画像をダウンロードしてコミット待ちに追加し、HF上のパスを返す（画像ごとに並行処理）
+        
+        同じバッチ内で既に処理したURLはurl_cacheの結果を再利用し、再ダウンロードしない
+        """
+        tasks = []
+        for i, media_url in enumerate(tweet.get('media', [])):
+            task = url_cache.get(media_url)
+            if task is None:
+                task = asyncio.create_task(
+                    self._process_tweet_image(session, tweet, i, media_url, username, temp_dir)
+                )
+                url_cache[media_url] = task
+            tasks.append(task)
+        
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        return [hf_path for hf_path in results if isinstance(hf_path, str)]
+    
+    async def _process_tweet_image(self, session: aiohttp.ClientSession, tweet: Dict[str, Any], i: int,
+                                   media_url: str, username: str, temp_dir: Path) -> Optional[str]:
+        """画像1枚をダウンロードしてコミット待ちに追加し、HF上のパスを返す"""
+        try:
+            # 拡張子を判定（不明な場合はjpgをデフォルトとする）
+            ext = _parse_media_ext(media_url, 'jpg', _VALID_IMAGE_EXTS)
+            
+            filename = f"{tweet['id']}_{i}.{ext}"
+            local_path = temp_dir / filename
+            
+            # ダウンロード（rclone暗号化が有効な場合はダウンロードしながら暗号化）
+            result = await self._download_for_upload(session, media_url, local_path)
+            if result is None:
+                return None
+            upload_path, encrypted_path, sha256 = result
+            
+            # HFにアップロード（通常のencrypted_imagesディレクトリに保存）
+            hf_path = f"encrypted_images/{username}/{tweet['id']}/{filename}"
+            if encrypted_path:
+                hf_path += ".enc"
+            
+            # 同じ内容のファイルをアップロード済みならそのURLを再利用
+            if await self._reuse_uploaded(hf_path, sha256, cleanup_path=encrypted_path):
+                return hf_path
+            
+            # コミット待ちに追加（暗号化ファイルはコミット後に削除）
+            await self._queue_upload(upload_path, hf_path, cleanup_path=encrypted_path, sha256=sha256)
+            self.logger.debug(f"Queued image for HF upload: {hf_path}")
+            
+            return hf_path
+                
+        except Exception as e:
+            self.logger.error(f"Failed to process image {media_url}: {e}")
+            return None
+    
+    async def _download_for_upload(self, session: aiohttp.ClientSession, url: str,
+                                   local_path: Path) -> Optional[tuple[str, Optional[Path], str]]:
+        """メディアをダウンロードし、(アップロードするファイル, 暗号化ファイル, 元データのSHA-256) を返す（失敗時None）
+        
+        rclone暗号化が有効な場合はダウンロードしたデータをrcloneの標準入力へそのまま流し、
+        平文の一時ファイルを作らずに暗号化する。失敗した場合はファイル経由で暗号化する
+        """
+        if self.rclone_client:
+            hasher = hashlib.sha256()
+            
+            async def hashed_chunks(chunks):
+                async for chunk in chunks:
+                    hasher.update(chunk)
+                    yield chunk
+            
+            async with session.get(url) as response:
+                if response.status != 200:
+                    return None
+                encrypted_path = await self.rclone_client.encrypt_stream(
+                    hashed_chunks(response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE)),
+                    local_path.name
+                )
+            if encrypted_path:
+                return str(encrypted_path), encrypted_path, hasher.hexdigest()
+            self.logger.warning(f"Stream encryption failed, falling back to file encryption: {url}")
         
-        # 動画をダウンロード
-        async with aiohttp.ClientSession() as session:
-            for i, video_url in enumerate(tweet.get('videos', [])):
+        # メモリに全体を載せずにディスクへストリーミング
+        hasher = hashlib.sha256()
+        if not await self._download_to_file(session, url, local_path, hasher):
+            return None
+        
+        # rcloneサブプロセスの待ち時間で他のダウンロードが進むようスレッドで実行
+        encrypted_path = None
+        if self.rclone_client:
+            encrypted_path = await asyncio.to_thread(self._encrypt_for_upload, local_path, local_path.name)
+        if encrypted_path:
+            return str(encrypted_path), encrypted_path, hasher.hexdigest()
+        return str(local_path), None, hasher.hexdigest()
+    
+    def _encrypt_for_upload(self, local_path: Path, filename: str) -> Optional[Path]:
+        """rcloneで暗号化し、暗号化ファイルのパスを返す（同期処理、スレッドから呼び出す）"""
+        # rclone_clientのtemp_dir内にファイルを配置してから暗号化
+        # （同一ファイルシステムならハードリンクでデータを書き直さない）
+        rclone_temp_path = self.rclone_client.temp_dir / filename
+        try:
+            os.link(local_path, rclone_temp_path)
+        except OSError:
+            shutil.copyfile(local_path, rclone_temp_path)
+        try:
+            return self.rclone_client.encrypt_file(
+                rclone_temp_path,
+                self.rclone_client.temp_dir / (filename + '.enc')
+            )
+        finally:
+            # 一時ファイルを削除
+            rclone_temp_path.unlink(missing_ok=True)
+    
+    def _encrypt_files_for_upload(self, file_paths: List[Path]) -> Dict[str, Path]:
+        """複数ファイルを1回のrclone呼び出しで暗号化し、ファイル名→暗号化ファイルを返す（同期処理、スレッドから呼び出す）"""
+        # rclone_clientのtemp_dir内の作業ディレクトリにまとめて配置してから暗号化
+        stage_dir = self.rclone_client.temp_dir / f"stage_{uuid.uuid4().hex}"
+        stage_dir.mkdir(parents=True)
+        try:
+            for file_path in file_paths:
                 try:
-                    # ファイル名を生成（URLパラメータを除去）
-                    # URLからファイル名部分を抽出
-                    if '/' in video_url:
-                        file_part = video_url.split('/')[-1]
-                    else:
-                        file_part = video_url
-                    
-                    # パラメータを除去
-                    if '?' in file_part:
-                        file_part = file_part.split('?')[0]
-                    
-                    # 拡張子を判定
-                    if '.m3u8' in file_part:
-                        ext = 'm3u8'
-                    elif '.gif' in file_part:
-                        ext = 'gif'
-                    elif '.' in file_part:
-                        ext = file_part.split('.')[-1]
-                        # 有効な動画拡張子かチェック
-                        valid_video_extensions = ['mp4', 'mov', 'avi', 'webm', 'mkv', 'flv', 'wmv', 'm4v', 'gif', 'm3u8']
-                        if ext.lower() not in valid_video_extensions:
-                            ext = 'mp4'  # 不明な拡張子の場合はmp4をデフォルト
-                    else:
-                        ext = 'mp4'  # デフォルト
-                    
-                    filename = f"{tweet['id']}_video_{i}.{ext}"
-                    local_path = temp_dir / filename
-                    
-                    # ダウンロード
-                    async with session.get(video_url) as response:
-                        if response.status == 200:
-                            content = await response.read()
-                            local_path.write_bytes(content)
-                            
-                            # HFにアップロード（通常のencrypted_videosディレクトリに保存）
-                            hf_path = f"encrypted_videos/{username}/{tweet['id']}/{filename}"
-                            
-                            # rclone暗号化が有効な場合
-                            if self.rclone_client:
-                                # rclone_clientのtemp_dir内にファイルをコピーしてから暗号化
-                                rclone_temp_path = self.rclone_client.temp_dir / filename
-                                rclone_temp_path.write_bytes(content)
-                                encrypted_filename = filename + '.enc'
-                                encrypted_path = self.rclone_client.encrypt_file(
-                                    rclone_temp_path, 
-                                    self.rclone_client.temp_dir / encrypted_filename
-                                )
-                                if encrypted_path:
-                                    upload_path = str(encrypted_path)
-                                    hf_path += ".enc"
-                                else:
-                                    upload_path = str(local_path)
-                                # 一時ファイルを削除
-                                if rclone_temp_path.exists():
-                                    rclone_temp_path.unlink()
-                            else:
-                                upload_path = str(local_path)
-                            
-                            # アップロード（リトライ機能付き）
-                            upload_success = await self._upload_with_retry(
-                                upload_path=upload_path,
-                                hf_path=hf_path
-                            )
-                            
-                            if upload_success:
-                                # HF URLを記録
-                                hf_url = f"https://huggingface.co/datasets/{self.full_repo_name}/resolve/main/{hf_path}"
-                                hf_urls.append(hf_url)
-                                
-                                self.logger.debug(f"Uploaded video to HF: {hf_path}")
-                            
-                            # 暗号化ファイルがある場合は削除
-                            if self.rclone_client and encrypted_path and Path(encrypted_path).exists():
-                                Path(encrypted_path).unlink()
-                                
-                except Exception as e:
-                    self.logger.error(f"Failed to process video {video_url}: {e}")
+                    os.link(file_path, stage_dir / file_path.name)
+                except OSError:
+                    shutil.copyfile(file_path, stage_dir / file_path.name)
+            return self.rclone_client.encrypt_dir(stage_dir)
+        finally:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+    
+    async def _process_tweet_videos(self, session: aiohttp.ClientSession, tweet: Dict[str, Any],
+                                    username: str, temp_dir: Path,
+                                    url_cache: Dict[str, asyncio.Task]) -> List[str]:
+        """ツイートの動画をダウンロードしてコミット待ちに追加し、HF上のパスを返す（動画ごとに並行処理）
+        
+        同じバッチ内で既に処理したURLはurl_cacheの結果を再利用し、再ダウンロードしない
+        """
+        tasks = []
+        for i, video_url in enumerate(tweet.get('videos', [])):
+            task = url_cache.get(video_url)
+            if task is None:
+                task = asyncio.create_task(
+                    self._process_tweet_video(session, tweet, i, video_url, username, temp_dir)
+                )
+                url_cache[video_url] = task
+            tasks.append(task)
+        
+        results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        return hf_urls
+        return [hf_path for hf_path in results if isinstance(hf_path, str)]
+    
+    async def _process_tweet_video(self, session: aiohttp.ClientSession, tweet: Dict[str, Any], i: int,
+                                   video_url: str, username: str, temp_dir: Path) -> Optional[str]:
+        """動画1本をダウンロードしてコミット待ちに追加し、HF上のパスを返す"""
+        try:
+            # 拡張子を判定（不明な場合はmp4をデフォルトとする）
+            ext = _parse_media_ext(video_url, 'mp4', _VALID_VIDEO_EXTS)
+            
+            filename = f"{tweet['id']}_video_{i}.{ext}"
+            local_path = temp_dir / filename
+            
+            # ダウンロード（rclone暗号化が有効な場合はダウンロードしながら暗号化）
+            result = await self._download_for_upload(session, video_url, local_path)
+            if result is None:
+                return None
+            upload_path, encrypted_path, sha256 = result
+            
+            # HFにアップロード（通常のencrypted_videosディレクトリに保存）
+            hf_path = f"encrypted_videos/{username}/{tweet['id']}/{filename}"
+            if encrypted_path:
+                hf_path += ".enc"
+            
+            # 同じ内容のファイルをアップロード済みならそのURLを再利用
+            if await self._reuse_uploaded(hf_path, sha256, cleanup_path=encrypted_path):
+                return hf_path
+            
+            # コミット待ちに追加（暗号化ファイルはコミット後に削除）
+            await self._queue_upload(upload_path, hf_path, cleanup_path=encrypted_path, sha256=sha256)
+            self.logger.debug(f"Queued video for HF upload: {hf_path}")
+            
+            return hf_path
+                
+        except Exception as e:
+            self.logger.error(f"Failed to process video {video_url}: {e}")
+            return None
     
     
     def _handle_file_limit_and_create_new_repo(self) -> bool:
@@ -556,17 +839,18 @@ Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             self.backup_manager.full_repo_name = new_repo_name
             self.logger.info(f"Updated BackupManager's repository to: {new_repo_name}")
         
-        # 新しいリポジトリを作成
+        # 新しいリポジトリを作成（作成・確認済みなら何もしない）
+        if self.full_repo_name in self._ensured_repos:
+            return True
         try:
             create_repo(
                 self.full_repo_name,
-                token=self.api.token,
-                repo_type="dataset"
+                token=self._token,
+                repo_type="dataset",
+                exist_ok=True
             )
+            self._ensured_repos.add(self.full_repo_name)
             self.logger.info(f"Created new dataset repository: {self.full_repo_name}")
-            
-            # 少し待機
-            time.sleep(2)
             return True
         except Exception as create_error:
             self.logger.error(f"Failed to create new repository: {create_error}")
@@ -575,6 +859,8 @@ Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
     def _handle_upload_error(self, error: Exception) -> tuple[bool, float]:
         """アップロードエラーを処理し、待機時間を返す
         
+        ファイル上限エラーではリポジトリ作成・config.yaml更新を行うため、スレッドから呼び出す
+        
         Returns:
             tuple[bool, float]: (リトライすべきか, 待機時間(秒))
         """
@@ -583,71 +869,186 @@ Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         # ファイル数上限エラーをチェック
         if "over the limit of 100000 files" in error_msg:
             if self._handle_file_limit_and_create_new_repo():
-                return True, 2.0  # 新しいリポジトリでリトライ
+                return True, 2.0  # 新しいリポジトリの作成を少し待ってからリトライ
             return False, 0
         
-        # レート制限エラーをチェック (429 Too Many Requests)
-        if "429" in error_msg and "Too Many Requests" in error_msg:
-            self.logger.warning(f"Rate limit error: {error_msg}")
-            
-            # エラーメッセージから待機時間を抽出
-            wait_time = 3600  # デフォルト1時間
-            
-            # パターン1: "retry this action in about X hour/minute"
-            match = re.search(r'retry this action in about (\d+) (hour|minute)', error_msg)
+        # レート制限エラー以外はリトライしない (429 Too Many Requests)
+        if "429" not in error_msg or "Too Many Requests" not in error_msg:
+            return False, 0
+        
+        self.logger.warning(f"Rate limit error: {error_msg}")
+        
+        # エラーメッセージから待機時間を抽出
+        wait_time = 3600  # デフォルト1時間
+        
+        # パターン1: "retry this action in about X hour/minute"
+        match = _RATE_LIMIT_PAT1.search(error_msg)
+        if match:
+            time_value = int(match.group(1))
+            time_unit = match.group(2)
+            if time_unit == "hour":
+                wait_time = time_value * 3600
+            elif time_unit == "minute":
+                wait_time = time_value * 60
+        
+        # パターン2: "you can retry this action in X minutes"
+        else:
+            match = _RATE_LIMIT_PAT2.search(error_msg)
             if match:
                 time_value = int(match.group(1))
                 time_unit = match.group(2)
-                if time_unit == "hour":
+                if "hour" in time_unit:
                     wait_time = time_value * 3600
-                elif time_unit == "minute":
+                else:
                     wait_time = time_value * 60
-            
-            # パターン2: "you can retry this action in X minutes"
-            else:
-                match = re.search(r'you can retry this action in (\d+) (minutes?|hours?)', error_msg)
-                if match:
-                    time_value = int(match.group(1))
-                    time_unit = match.group(2)
-                    if "hour" in time_unit:
-                        wait_time = time_value * 3600
-                    else:
-                        wait_time = time_value * 60
-            
-            return True, wait_time
         
-        # その他のエラー
-        return False, 0
+        return True, wait_time
+    
+    def _delete_files(self, paths) -> None:
+        """ファイルをまとめて削除（同期処理、スレッドから呼び出す）
+        
+        encrypt_dirの出力先ディレクトリは、中のファイルがすべて削除された時点で削除する
+        """
+        for path in paths:
+            try:
+                Path(path).unlink(missing_ok=True)
+            except OSError as e:
+                self.logger.error(f"Failed to delete file {path}: {e}")
+        if self.rclone_client:
+            self.rclone_client.remove_empty_output_dirs(paths)
+    
+    async def _reuse_uploaded(self, hf_path: str, sha256: Optional[str], cleanup_path=None) -> bool:
+        """同じ内容のファイルをアップロード済みなら、そのURLを次のflushの結果に含めてTrueを返す"""
+        if not self.db_manager or not sha256:
+            return False
+        
+        hf_url = await asyncio.to_thread(self.db_manager.get_hf_media_url_by_sha256, sha256)
+        if not hf_url:
+            return False
+        
+        self._reused_urls[hf_path] = hf_url
+        if cleanup_path:
+            await asyncio.to_thread(self._delete_files, [cleanup_path])
+        self.logger.debug(f"Reusing uploaded file with identical content for {hf_path}")
+        return True
+    
+    async def _queue_upload(self, upload_path: str, hf_path: str, cleanup_path=None,
+                            sha256: Optional[str] = None):
+        """アップロードをコミット待ちに追加（sha256は元データの内容ハッシュ）"""
+        # CommitOperationAddは生成時にファイル全体のハッシュを計算するためスレッドで実行
+        try:
+            operation = await asyncio.to_thread(
+                CommitOperationAdd,
+                path_in_repo=hf_path,
+                path_or_fileobj=upload_path
+            )
+        except Exception:
+            # コミットされないファイルはここで削除
+            if cleanup_path:
+                self._delete_files([cleanup_path])
+            raise
+        self._pending_ops.append(operation)
+        if cleanup_path:
+            self._pending_cleanup.append(Path(cleanup_path))
+        if sha256:
+            self._pending_hashes[hf_path] = sha256
+    
+    async def _flush_uploads(self) -> Dict[str, str]:
+        """コミット待ちのファイルを1コミットでアップロードし、HF上のパス→HF URLを返す
+        
+        アップロード済みのURLを再利用したファイルも結果に含める
+        """
+        operations, self._pending_ops = self._pending_ops, []
+        cleanup_paths, self._pending_cleanup = self._pending_cleanup, []
+        pending_hashes, self._pending_hashes = self._pending_hashes, {}
+        reused_urls, self._reused_urls = self._reused_urls, {}
+        if not operations:
+            return reused_urls
+        
+        commit_message = f"Upload {len(operations)} log-only media files"
+        preuploaded_repo = None
+        
+        def commit_to_current_repo():
+            # ファイル上限でリポジトリが切り替わる場合があるため、repo_idは試行ごとに解決
+            nonlocal operations, preuploaded_repo
+            repo_id = self.full_repo_name
+            if preuploaded_repo is not None and preuploaded_repo != repo_id:
+                # 旧リポジトリへ事前アップロード済みの操作は新しいリポジトリでは転送がスキップされるため作り直す
+                operations = [
+                    CommitOperationAdd(path_in_repo=op.path_in_repo, path_or_fileobj=op.path_or_fileobj)
+                    for op in operations
+                ]
+            preuploaded_repo = repo_id
+            self._commit_operations(repo_id, operations, commit_message)
+        
+        try:
+            success = await self._run_with_retry(
+                f"batch of {len(operations)} files",
+                lambda: commit_to_current_repo
+            )
+        finally:
+            # 暗号化ファイルを削除
+            await asyncio.to_thread(self._delete_files, cleanup_paths)
+        
+        if not success:
+            return reused_urls
+        
+        self.logger.debug(f"Committed {len(operations)} files to HF")
+        uploaded_urls = {
+            op.path_in_repo: f"{self._resolve_base}/{op.path_in_repo}"
+            for op in operations
+        }
+        
+        # 次回以降、同じ内容のファイルはアップロードせずにURLを再利用する
+        if self.db_manager and pending_hashes:
+            await asyncio.to_thread(self.db_manager.save_hf_media_hashes, [
+                (sha256, uploaded_urls[hf_path])
+                for hf_path, sha256 in pending_hashes.items()
+                if hf_path in uploaded_urls
+            ])
+        
+        uploaded_urls.update(reused_urls)
+        return uploaded_urls
+    
+    def _commit_operations(self, repo_id: str, operations: List[CommitOperationAdd], commit_message: str):
+        """LFSファイルを事前アップロードしてからコミット（同期処理、スレッドから呼び出す）"""
+        # サーバーに既にあるLFSファイルは転送をスキップされ、アップロード済みの操作は
+        # リトライ時に再送されない
+        self.api.preupload_lfs_files(
+            repo_id=repo_id,
+            additions=operations,
+            repo_type="dataset"
+        )
+        self.api.create_commit(
+            repo_id=repo_id,
+            repo_type="dataset",
+            operations=operations,
+            commit_message=commit_message
+        )
     
-    async def _upload_with_retry(self, upload_path: str, hf_path: str) -> bool:
-        """リトライ機能付きのアップロード処理"""
+    async def _run_with_retry(self, target: str, make_call) -> bool:
+        """リトライ機能付きでHF APIの同期呼び出しを実行（make_callは試行ごとに呼び出しを生成）"""
         for attempt in range(self.max_retries):
             try:
-                # レート制限対策：前回のアップロードから一定時間待機
-                current_time = time.time()
-                time_since_last = current_time - self.last_upload_time
+                # レート制限対策：前回のアップロード開始から一定時間待機
+                time_since_last = time.time() - self.last_upload_time
                 if time_since_last < self.base_delay:
                     await asyncio.sleep(self.base_delay - time_since_last)
+                self.last_upload_time = time.time()
                 
-                # アップロード実行
-                upload_file(
-                    path_or_fileobj=upload_path,
-                    path_in_repo=hf_path,
-                    repo_id=self.full_repo_name,
-                    repo_type="dataset",
-                    token=self.api.token
-                )
+                # アップロード実行（同期APIのためスレッドで実行しイベントループを塞がない）
+                await asyncio.to_thread(make_call())
                 
-                self.last_upload_time = time.time()
                 return True
                 
             except Exception as e:
-                should_retry, wait_time = self._handle_upload_error(e)
+                # リポジトリの切り替えはブロッキング処理を含むためスレッドで実行
+                should_retry, wait_time = await asyncio.to_thread(self._handle_upload_error, e)
                 
                 if should_retry:
                     # レート制限エラーの場合
                     self.logger.warning(
-                        f"Rate limit hit for {hf_path}. "
+                        f"Rate limit hit for {target}. "
                         f"Waiting {wait_time:.1f}s before retry {attempt + 1}/{self.max_retries}"
                     )
                     await asyncio.sleep(wait_time)
@@ -655,14 +1056,15 @@ Created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                 
                 # その他のエラー
                 if attempt < self.max_retries - 1:
-                    wait_time = self.base_delay * (attempt + 1)
+                    # 上限付き指数バックオフ（フルジッター）で再試行のタイミングを分散
+                    wait_time = random.uniform(0, min(60.0, self.base_delay * (2 ** attempt)))
                     self.logger.warning(
-                        f"Upload failed for {hf_path}: {e}. "
+                        f"Upload failed for {target}: {e}. "
                         f"Retrying in {wait_time:.1f}s ({attempt + 1}/{self.max_retries})"
                     )
                     await asyncio.sleep(wait_time)
                 else:
-                    self.logger.error(f"Failed to upload {hf_path} after {self.max_retries} attempts: {e}")
+                    self.logger.error(f"Failed to upload {target} after {self.max_retries} attempts: {e}")
                     return False
         
         return False
@@ -1,11 +1,41 @@
 import os
 import json
+import asyncio
+import atexit
 import logging
+import math
+import secrets
+import shutil
+import socket
 import subprocess
+import threading
 import time
+import uuid
+import requests
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, AsyncIterator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+
+# (connect, read) timeouts for rcd requests; transfers get a much longer read timeout
+_RC_TIMEOUT = (5, 60)
+_RC_TRANSFER_TIMEOUT = (5, 3600)
+_RC_TRANSFER_COMMANDS = frozenset({"sync/copy", "operations/copyfile"})
+
+
+@lru_cache(maxsize=None)
+def _rclone_executable() -> str:
+    """Absolute path of the rclone binary (falls back to a PATH lookup at launch)"""
+    return shutil.which("rclone") or "rclone"
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of up to size items without slicing the whole input up front"""
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
 
 
 @dataclass
@@ -19,6 +49,9 @@ class RcloneConfig:
 class RcloneClient:
     """Client for handling rclone encryption operations"""
     
+    # Startup check results keyed by resolved config path (None = default config)
+    _init_cache: Dict[Optional[str], Dict] = {}
+    
     def __init__(self, config: RcloneConfig):
         self.config = config
         self.logger = logging.getLogger('hf_backup.rclone')
@@ -27,27 +60,49 @@ class RcloneClient:
         self.temp_dir = Path(config.temp_dir)
         self.temp_dir.mkdir(exist_ok=True)
         
+        # Resolve once: the crypt remote writes to eventmonitor_encrypted_files under the working directory
+        self._cwd = Path.cwd()
+        self._encrypted_dir = self._cwd / "eventmonitor_encrypted_files"
+        self._config_path = str(Path(config.config_path).resolve()) if config.config_path else None
+        
+        # Long-lived `rclone rcd` daemon, started on first use (see _rc)
+        self._rcd: Optional[subprocess.Popen] = None
+        self._rcd_url: Optional[str] = None
+        self._rcd_auth: Optional[Tuple[str, str]] = None
+        self._rcd_failed = False
+        self._rcd_lock = threading.Lock()
+        # Reuse one keep-alive connection pool for every request to the daemon
+        self._rcd_session = requests.Session()
+        
+        # Results of the startup checks are shared by every client using the same config
+        cache_key = self._config_path
+        cache = RcloneClient._init_cache.setdefault(cache_key, {})
+        
         # Verify rclone is available
-        if not self._check_rclone():
-            raise RuntimeError("rclone not found. Please install rclone first.")
+        if not cache.get('rclone_ok'):
+            if not self._check_rclone():
+                raise RuntimeError("rclone not found. Please install rclone first.")
+            cache['rclone_ok'] = True
         
         # 自動検出が必要な場合
         if not self.config.remote_name:
-            self.config.remote_name = self._auto_detect_crypt_remote()
+            if not cache.get('crypt_remote'):
+                cache['crypt_remote'] = self._auto_detect_crypt_remote()
+            self.config.remote_name = cache['crypt_remote']
             if not self.config.remote_name:
                 raise RuntimeError("No crypt remote found in rclone config")
             self.logger.info(f"Auto-detected crypt remote: {self.config.remote_name}")
         
         # Verify remote exists
-        if not self._verify_remote():
+        if not cache.get('remotes'):
+            cache['remotes'] = self.list_remotes()
+        if self.config.remote_name not in cache['remotes']:
             raise RuntimeError(f"Remote '{self.config.remote_name}' not found in rclone config")
     
     def _check_rclone(self) -> bool:
         """Check if rclone is installed and available"""
         try:
-            cmd = ["rclone", "version"]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            return result.returncode == 0
+            return self._spawn_rclone(["version"], stdout=subprocess.DEVNULL).returncode == 0
         except FileNotFoundError:
             return False
     
@@ -59,117 +114,241 @@ class RcloneClient:
     def _auto_detect_crypt_remote(self) -> Optional[str]:
         """暗号化リモートを自動検出"""
         try:
-            # rclone config showで設定を取得
-            cmd = ["rclone", "config", "show"]
-            if self.config.config_path:
-                cmd.extend(["--config", self.config.config_path])
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            # rclone config dumpで設定をJSONとして取得
+            result = self._spawn_rclone(["config", "dump"])
             if result.returncode != 0:
                 return None
             
-            # type = cryptのリモートを探す
-            crypt_remotes = []
-            current_remote = None
-            for line in result.stdout.split('\n'):
-                if line.startswith('[') and line.endswith(']'):
-                    current_remote = line[1:-1]
-                elif line.strip().startswith('type = crypt'):
-                    if current_remote:
-                        crypt_remotes.append(current_remote)
+            # 最初のcryptリモートを返す（type = crypt）
+            config_data = json.loads(result.stdout)
+            return next(
+                (name for name, remote in config_data.items() if remote.get('type') == 'crypt'),
+                None
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to auto-detect crypt remote: {e}")
+            return None
+    
+    def _build_command(self, args: List[str]) -> List[str]:
+        """Build an rclone command line with proper config"""
+        cmd = [_rclone_executable()] + args
+        if self._config_path:
+            cmd.extend(["--config", self._config_path])
+        return cmd
+    
+    def _ensure_rcd(self) -> bool:
+        """Start the rclone remote control daemon if it is not running yet
+        
+        Operations sent to the daemon skip the process startup and config
+        parsing that every one-off rclone invocation pays.
+        """
+        with self._rcd_lock:
+            if self._rcd is not None and self._rcd.poll() is None:
+                return True
+            if self._rcd_failed:
+                return False
+            
+            # Pick a free local port and random credentials for this process only
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                port = sock.getsockname()[1]
+            user, password = secrets.token_hex(8), secrets.token_hex(16)
+            env = dict(os.environ, RCLONE_RC_USER=user, RCLONE_RC_PASS=password)
             
-            # 最初のcryptリモートを返す
-            if crypt_remotes:
-                return crypt_remotes[0]
+            try:
+                # cwd matters: the crypt remote writes to eventmonitor_encrypted_files relative to it
+                self._rcd = subprocess.Popen(
+                    self._build_command(["rcd", f"--rc-addr=127.0.0.1:{port}"]),
+                    cwd=str(self._cwd),
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            except OSError as e:
+                self.logger.warning(f"Failed to start rclone rcd, using one-off rclone processes: {e}")
+                self._rcd_failed = True
+                return False
             
+            self._rcd_url = f"http://127.0.0.1:{port}"
+            self._rcd_auth = (user, password)
+            self._rcd_session.auth = self._rcd_auth
+            
+            # Wait until the daemon answers
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and self._rcd.poll() is None:
+                try:
+                    self._rcd_session.post(f"{self._rcd_url}/rc/noop", json={}, timeout=1).raise_for_status()
+                    atexit.register(self._stop_rcd)
+                    self.logger.debug(f"Started rclone rcd on port {port}")
+                    return True
+                except requests.RequestException:
+                    time.sleep(0.05)
+            
+            self.logger.warning("rclone rcd did not become ready, using one-off rclone processes")
+            self._kill_rcd()
+            self._rcd_failed = True
+            return False
+    
+    def _kill_rcd(self):
+        """Terminate the rcd daemon process (caller holds _rcd_lock or is shutting down)"""
+        if self._rcd is None:
+            return
+        if self._rcd.poll() is None:
+            self._rcd.terminate()
+            try:
+                self._rcd.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._rcd.kill()
+                self._rcd.wait()
+        self._rcd = None
+    
+    def _stop_rcd(self):
+        """Stop the rcd daemon if it is running"""
+        with self._rcd_lock:
+            self._kill_rcd()
+        self._rcd_session.close()
+    
+    def _rc(self, command: str, params: dict) -> Optional[dict]:
+        """Run an operation through the rcd daemon
+        
+        Returns:
+            The JSON response, or None if the daemon is unavailable or stops
+            answering (callers then fall back to a one-off rclone process)
+        
+        Raises:
+            RuntimeError: If rclone reports an error for the operation
+        """
+        if not self._ensure_rcd():
             return None
-        except Exception as e:
-            self.logger.error(f"Failed to auto-detect crypt remote: {e}")
+        
+        timeout = _RC_TRANSFER_TIMEOUT if command in _RC_TRANSFER_COMMANDS else _RC_TIMEOUT
+        try:
+            response = self._rcd_session.post(f"{self._rcd_url}/{command}", json=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Stop using a daemon that died or hangs; later calls go straight to the CLI
+            self.logger.warning(f"rclone rcd request {command} failed, using one-off rclone processes: {e}")
+            with self._rcd_lock:
+                self._kill_rcd()
+                self._rcd_failed = True
             return None
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code != 200:
+            raise RuntimeError(data.get('error') or response.text)
+        return data
     
-    def _run_rclone_command(self, args: List[str], cwd: Optional[str] = None) -> subprocess.CompletedProcess:
-        """Run an rclone command with proper config"""
-        cmd = ["rclone"] + args
-        if self.config.config_path:
-            config_path = Path(self.config.config_path).resolve()
-            cmd.extend(["--config", str(config_path)])
+    def _spawn_rclone(self, args: List[str], cwd: Optional[str] = None, input: Optional[bytes] = None,
+                      stdout: int = subprocess.PIPE, text: bool = False) -> subprocess.CompletedProcess:
+        """Run a one-off rclone process
         
+        With an absolute executable path, close_fds=False and no cwd, CPython
+        starts the child with posix_spawn, so the page tables of this (possibly
+        large) process are not copied. Callers that need the crypt remote's
+        relative output directory rely on the process cwd (self._cwd) instead of
+        passing cwd. Descriptors opened by Python are non-inheritable, so none
+        leak into rclone.
+        """
         return subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            cwd=cwd or str(self.temp_dir)
+            self._build_command(args),
+            input=input,
+            stdout=stdout,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+            text=text,
+            close_fds=False
         )
     
+    def _run_rclone_command(self, args: List[str], cwd: Optional[str] = None) -> subprocess.CompletedProcess:
+        """Run an rclone command with proper config"""
+        return self._spawn_rclone(args, cwd=cwd or str(self.temp_dir), text=True)
+    
+    def _run_rclone_quiet(self, args: List[str], input: Optional[bytes] = None) -> Tuple[int, str]:
+        """Run an rclone transfer whose output is not needed
+        
+        stdout is discarded and stderr is only decoded when the command fails.
+        
+        Returns:
+            (return code, stderr text on failure or "")
+        """
+        result = self._spawn_rclone(args, input=input, stdout=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return result.returncode, result.stderr.decode('utf-8', 'replace')
+        return 0, ""
+    
     def cleanup(self):
         """Clean up any temporary files"""
-        encrypted_dir = Path.cwd() / "eventmonitor_encrypted_files"
+        encrypted_dir = self._encrypted_dir
         if encrypted_dir.exists():
-            import shutil
             try:
                 shutil.rmtree(encrypted_dir)
             except Exception as e:
                 self.logger.warning(f"Failed to clean up {encrypted_dir}: {e}")
     
+    def _encrypted_name(self, rel_path: str) -> Optional[str]:
+        """Return the path the crypt remote stores rel_path under (relative to the encrypted directory)"""
+        try:
+            data = self._rc("backend/command", {
+                "command": "encode",
+                "fs": f"{self.config.remote_name}:",
+                "arg": [rel_path]
+            })
+        except Exception as e:
+            self.logger.error(f"rclone encode failed for {rel_path}: {e}")
+            return None
+        if data is not None:
+            return data["result"][0]
+        
+        result = self._spawn_rclone(
+            ["cryptdecode", "--reverse", f"{self.config.remote_name}:", rel_path],
+            text=True
+        )
+        if result.returncode != 0 or '\t' not in result.stdout:
+            self.logger.error(f"rclone cryptdecode failed for {rel_path}: {result.stderr}")
+            return None
+        return result.stdout.split('\t', 1)[1].strip()
+    
     def encrypt_file(self, file_path: Path, encrypted_path: Path) -> Optional[Path]:
         """Encrypt a single file using rclone"""
         try:
             # Create parent directory if it doesn't exist
             encrypted_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Get list of existing files before encryption
             # The encrypted files go to eventmonitor_encrypted_files in current directory
-            encrypted_dir = Path.cwd() / "eventmonitor_encrypted_files"
-            existing_files = set()
-            if encrypted_dir.exists():
-                existing_files = {f for f in encrypted_dir.rglob('*') if f.is_file()}
-            
-            # Build rclone command
-            cmd = ["rclone", "copyto"]
-            if self.config.config_path:
-                # Use absolute path for config file
-                config_path = Path(self.config.config_path).resolve()
-                cmd.extend(["--config", str(config_path)])
+            encrypted_dir = self._encrypted_dir
             
             # For rclone crypt, we need to preserve the relative path structure
             # but let rclone handle the encryption of directory names
             rel_path = encrypted_path.relative_to(self.temp_dir)
-            cmd.extend([
-                str(file_path),
-                f"{self.config.remote_name}:{rel_path}"
-            ])
-            
-            # Run rclone encryption 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True
-            )
             
-            if result.returncode != 0:
-                self.logger.error(f"rclone encryption failed for {file_path}: {result.stderr}")
-                self.logger.error(f"Command was: {' '.join(cmd)}")
+            # Prefer the rcd daemon; fall back to a one-off `rclone copyto`
+            try:
+                copied = self._rc("operations/copyfile", {
+                    "srcFs": str(file_path.parent.resolve()),
+                    "srcRemote": file_path.name,
+                    "dstFs": f"{self.config.remote_name}:",
+                    "dstRemote": rel_path.as_posix()
+                })
+            except Exception as e:
+                self.logger.error(f"rclone encryption failed for {file_path}: {e}")
                 return None
             
-            # Debug output
-            self.logger.debug(f"rclone output: {result.stdout}")
-            self.logger.debug(f"Working directory: {Path.cwd()}")
-            
-            # Find the newly created encrypted file
-            time.sleep(0.5)  # Increased delay to ensure file is written
+            if copied is None:
+                # Run rclone encryption 
+                args = ["copyto", str(file_path), f"{self.config.remote_name}:{rel_path}"]
+                returncode, stderr = self._run_rclone_quiet(args)
+                if returncode != 0:
+                    self.logger.error(f"rclone encryption failed for {file_path}: {stderr}")
+                    self.logger.error(f"Command was: rclone {' '.join(args)}")
+                    return None
             
-            self.logger.debug(f"Looking for encrypted files in: {encrypted_dir}")
-            self.logger.debug(f"Directory exists: {encrypted_dir.exists()}")
-            
-            if encrypted_dir.exists():
-                # Get all files after encryption
-                new_files = {f for f in encrypted_dir.rglob('*') if f.is_file()}
-                # Find the difference - the newly created file
-                created_files = new_files - existing_files
-                
-                if created_files:
-                    # Should be exactly one new file
-                    actual_path = created_files.pop()
+            # Ask rclone for the encrypted name instead of diffing the output directory,
+            # so concurrent encryptions cannot be mistaken for this file
+            encrypted_name = self._encrypted_name(rel_path.as_posix())
+            if encrypted_name:
+                actual_path = encrypted_dir / encrypted_name
+                if actual_path.exists():
                     return actual_path
             
             self.logger.error(f"Could not find encrypted file for {file_path}")
@@ -179,28 +358,144 @@ class RcloneClient:
             self.logger.error(f"Exception during encryption of {file_path}: {e}")
             return None
     
+    def _list_encrypted(self, remote_path: str, recursive: bool = False) -> Optional[List[Dict]]:
+        """List files under remote_path with their encrypted names (lsjson --encrypted)
+        
+        Returns:
+            lsjson entries (Path, Name, Encrypted, EncryptedPath, ...), or None on failure
+        """
+        try:
+            listing = self._rc("operations/list", {
+                "fs": remote_path,
+                "remote": "",
+                "opt": {
+                    "recurse": recursive,
+                    "filesOnly": True,
+                    "showEncrypted": True,
+                    "noModTime": True,
+                    "noMimeType": True
+                }
+            })
+        except Exception as e:
+            self.logger.error(f"rclone lsjson failed for {remote_path}: {e}")
+            return None
+        if listing is not None:
+            return listing["list"]
+        
+        args = ["lsjson", "--files-only", "--encrypted", "--no-modtime", "--no-mimetype", remote_path]
+        if recursive:
+            args.insert(1, "-R")
+        result = self._spawn_rclone(args, text=True)
+        if result.returncode != 0:
+            self.logger.error(f"rclone lsjson failed for {remote_path}: {result.stderr}")
+            return None
+        return json.loads(result.stdout)
+    
+    def encrypt_dir(self, src_dir: Path) -> Dict[str, Path]:
+        """Encrypt all files directly under src_dir with a single rclone call
+        
+        Returns:
+            Mapping of source file name to encrypted file path
+        """
+        try:
+            # Unique destination; the crypt remote also encrypts the directory name
+            dir_name = f"dir_{uuid.uuid4().hex}"
+            dst = f"{self.config.remote_name}:{dir_name}"
+            encrypted_dir_name = self._encrypted_name(dir_name)
+            if encrypted_dir_name is None:
+                return {}
+            output_dir = self._encrypted_dir / encrypted_dir_name
+            
+            copied = self._rc("sync/copy", {
+                "srcFs": str(src_dir.resolve()),
+                "dstFs": dst,
+                "_config": {"Transfers": 16, "NoTraverse": True, "NoCheckDest": True}
+            })
+            if copied is None:
+                returncode, stderr = self._run_rclone_quiet(
+                    ["copy", str(src_dir.resolve()), dst, "--transfers", "16", "--no-traverse", "--no-check-dest"]
+                )
+                if returncode != 0:
+                    self.logger.error(f"rclone encryption failed for {src_dir}: {stderr}")
+                    return {}
+            
+            # Map source names to encrypted names
+            entries = self._list_encrypted(dst)
+            if entries is None:
+                shutil.rmtree(output_dir, ignore_errors=True)
+                return {}
+            
+            encrypted_files = {}
+            for entry in entries:
+                encrypted_path = output_dir / entry['Encrypted']
+                if encrypted_path.exists():
+                    encrypted_files[entry['Name']] = encrypted_path
+            return encrypted_files
+            
+        except Exception as e:
+            self.logger.error(f"Exception during encryption of {src_dir}: {e}")
+            return {}
+    
+    async def encrypt_stream(self, chunks: AsyncIterator[bytes], filename: str) -> Optional[Path]:
+        """Encrypt data read from an async iterator by piping it into rclone rcat
+        
+        No plaintext copy is written to disk. Errors raised by the iterator
+        are propagated after the partial output has been removed.
+        
+        Returns:
+            Path of the encrypted file, or None if rclone failed
+        """
+        name = f"{uuid.uuid4().hex}_{filename}"
+        encrypted_dir = self._encrypted_dir
+        
+        # Resolve the encrypted name up front (unique name, so no directory diff is needed)
+        encrypted_name = await asyncio.to_thread(self._encrypted_name, name)
+        if not encrypted_name:
+            return None
+        encrypted_path = encrypted_dir / encrypted_name
+        
+        proc = await asyncio.create_subprocess_exec(
+            *self._build_command(["rcat", f"{self.config.remote_name}:{name}"]),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            try:
+                async for chunk in chunks:
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+                proc.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                # rclone exited early; the reason is reported via stderr below
+                pass
+            _, stderr = await proc.communicate()
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            encrypted_path.unlink(missing_ok=True)
+            raise
+        
+        if proc.returncode != 0 or not encrypted_path.exists():
+            self.logger.error(f"rclone rcat failed for {filename}: {stderr.decode()}")
+            encrypted_path.unlink(missing_ok=True)
+            return None
+        
+        return encrypted_path
+    
     def decrypt_file(self, encrypted_path: Path, decrypted_path: Path) -> bool:
         """Decrypt a single file using rclone"""
         try:
             # Create parent directory if it doesn't exist
             decrypted_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Build rclone command
-            cmd = ["rclone", "copyto"]
-            if self.config.config_path:
-                cmd.extend(["--config", self.config.config_path])
-            
-            cmd.extend([
-                f"{self.config.remote_name}:{encrypted_path.name}",
-                str(decrypted_path)
-            ])
-            
             # Run rclone decryption
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=str(encrypted_path.parent)
+            result = self._spawn_rclone(
+                ["copyto", f"{self.config.remote_name}:{encrypted_path.name}", str(decrypted_path)],
+                cwd=str(encrypted_path.parent),
+                stdout=subprocess.DEVNULL,
+                text=True
             )
             
             if result.returncode != 0:
@@ -228,158 +523,183 @@ class RcloneClient:
         
         # Process files in chunks to avoid memory/CPU overload
         total_files = len(file_paths)
-        chunks = [file_paths[i:i + batch_size] for i in range(0, total_files, batch_size)]
+        total_chunks = math.ceil(total_files / batch_size)
         
-        self.logger.info(f"Processing {total_files} files in {len(chunks)} batches of up to {batch_size} files each")
+        self.logger.info(f"Processing {total_files} files in {total_chunks} batches of up to {batch_size} files each")
         
-        # Clean up any existing encrypted files directory only at the start
-        encrypted_dir = Path.cwd() / "eventmonitor_encrypted_files"
-        if encrypted_dir.exists():
-            import shutil
+        # The encrypted directory is kept between calls; each call writes into its
+        # own run_<uuid> subdirectory, which cleanup_temp_files removes afterwards
+        run_dir = f"run_{uuid.uuid4().hex}"
+        
+        # Batches write to distinct batch_N subdirectories, so they can run side by side.
+        # Only max_workers batches are in flight at once, so later chunks are not
+        # materialised until a worker is free to take them.
+        max_workers = min(4, total_chunks)
+        chunks = enumerate(_chunked(file_paths, batch_size))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rclone_batch") as executor:
+            in_flight = {
+                executor.submit(self._encrypt_single_batch, chunk_idx, total_chunks, chunk, base_dir, run_dir)
+                for chunk_idx, chunk in islice(chunks, max_workers)
+            }
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    encrypted_files.update(future.result())
+                for chunk_idx, chunk in islice(chunks, len(done)):
+                    in_flight.add(executor.submit(
+                        self._encrypt_single_batch, chunk_idx, total_chunks, chunk, base_dir, run_dir
+                    ))
+        
+        self.logger.info(f"Total encrypted: {len(encrypted_files)} files")
+        return encrypted_files
+    
+    def _encrypt_single_batch(self, chunk_idx: int, total_chunks: int, chunk: List[Path],
+                              base_dir: Path, run_dir: str) -> Dict[Path, Path]:
+        """Encrypt one chunk of encrypt_files_batch into its own run_dir/batch_N subdirectory"""
+        encrypted_files = {}
+        
+        self.logger.info(f"Processing batch {chunk_idx + 1}/{total_chunks} ({len(chunk)} files)")
+        
+        # Files are read in place from base_dir; rclone only gets the list of relative paths
+        file_mapping = {}  # Maps path relative to base_dir to original path
+        for file_path in chunk:
             try:
-                self.logger.info(f"Cleaning up existing encrypted directory: {encrypted_dir}")
-                shutil.rmtree(encrypted_dir)
-            except Exception as e:
-                self.logger.warning(f"Failed to clean up existing encrypted dir: {e}")
+                file_mapping[file_path.relative_to(base_dir)] = file_path
+            except ValueError as e:
+                self.logger.error(f"Error adding {file_path}: {e}")
         
-        for chunk_idx, chunk in enumerate(chunks):
-            self.logger.info(f"Processing batch {chunk_idx + 1}/{len(chunks)} ({len(chunk)} files)")
-            
-            # Create a temporary directory for source files
-            import tempfile
-            with tempfile.TemporaryDirectory() as temp_source_dir:
-                temp_source_path = Path(temp_source_dir)
-                
-                # Copy files to temporary directory maintaining structure
-                file_mapping = {}  # Maps temp path to original path
-                for file_path in chunk:
-                    try:
-                        # Calculate relative path from base directory
-                        rel_path = file_path.relative_to(base_dir)
-                        
-                        # Create destination in temp directory
-                        temp_dest = temp_source_path / rel_path
-                        temp_dest.parent.mkdir(parents=True, exist_ok=True)
-                        
-                        # Copy file
-                        import shutil
-                        shutil.copy2(file_path, temp_dest)
-                        file_mapping[temp_dest] = file_path
-                        
-                    except Exception as e:
-                        self.logger.error(f"Error copying {file_path}: {e}")
-                
-                if not file_mapping:
-                    self.logger.warning(f"No files copied for encryption in batch {chunk_idx + 1}")
-                    continue
-                
-                # Use rclone sync to encrypt entire directory at once
-                cmd = ["rclone", "sync"]
-                if self.config.config_path:
-                    config_path = Path(self.config.config_path).resolve()
-                    cmd.extend(["--config", str(config_path)])
-                
-                # Use batch-specific subdirectory to avoid conflicts
-                batch_subdir = f"batch_{chunk_idx}"
-                cmd.extend([
-                    str(temp_source_path),
+        if not file_mapping:
+            self.logger.warning(f"No files to encrypt in batch {chunk_idx + 1}")
+            return encrypted_files
+        
+        # Use batch-specific subdirectory to avoid conflicts
+        batch_subdir = f"{run_dir}/batch_{chunk_idx}"
+        
+        self.logger.info(f"Encrypting batch {chunk_idx + 1} ({len(file_mapping)} files)...")
+        
+        # Copy only the listed files in one rclone call (via the rcd daemon if available)
+        files_list = "".join(f"{rel_path.as_posix()}\n" for rel_path in file_mapping)
+        copied = None
+        if self._ensure_rcd():
+            # The rc API only accepts files-from lists as files
+            files_from = self.temp_dir / f"files_from_{uuid.uuid4().hex}.txt"
+            files_from.write_text(files_list, encoding="utf-8")
+            try:
+                copied = self._rc("sync/copy", {
+                    "srcFs": str(base_dir.resolve()),
+                    "dstFs": f"{self.config.remote_name}:{batch_subdir}",
+                    "_filter": {"FilesFromRaw": [str(files_from.resolve())]},
+                    # The destination is a fresh subdirectory, so skip listing/checking it
+                    "_config": {"Transfers": 32, "Checkers": 32, "NoTraverse": True, "NoCheckDest": True}
+                })
+            except Exception as e:
+                self.logger.error(f"rclone batch encryption failed for batch {chunk_idx + 1}: {e}")
+                return encrypted_files
+            finally:
+                files_from.unlink(missing_ok=True)
+        if copied is None:
+            # Run rclone copy
+            returncode, stderr = self._run_rclone_quiet(
+                [
+                    "copy",
+                    str(base_dir),
                     f"{self.config.remote_name}:{batch_subdir}",
-                    "--create-empty-src-dirs",
-                    "--transfers", "4",  # Limit concurrent transfers
-                    "--checkers", "4"    # Limit concurrent checkers
-                ])
-                
-                self.logger.info(f"Encrypting batch {chunk_idx + 1} ({len(file_mapping)} files)...")
-                
-                # Run rclone sync
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode != 0:
-                    self.logger.error(f"rclone batch encryption failed for batch {chunk_idx + 1}: {result.stderr}")
-                    continue
-                
-                # Wait for encrypted files to be created
-                time.sleep(1)
-                
-                # Find all encrypted files
-                if encrypted_dir.exists():
-                    # Look for files in the batch-specific subdirectory
-                    batch_dir = encrypted_dir / batch_subdir
-                    if batch_dir.exists():
-                        batch_encrypted_files = list(batch_dir.rglob('*'))
-                        batch_encrypted_files = [f for f in batch_encrypted_files if f.is_file()]
-                    else:
-                        # Fallback: look in the entire encrypted directory
-                        batch_encrypted_files = list(encrypted_dir.rglob('*'))
-                        batch_encrypted_files = [f for f in batch_encrypted_files if f.is_file()]
-                    
-                    self.logger.debug(f"Found {len(batch_encrypted_files)} encrypted files in batch {chunk_idx + 1}")
-                    
-                    # Simple mapping: assume same order and count
-                    if len(batch_encrypted_files) == len(file_mapping):
-                        # Sort both lists to ensure consistent mapping
-                        sorted_temp_paths = sorted(file_mapping.keys())
-                        sorted_encrypted = sorted(batch_encrypted_files)
-                        
-                        self.logger.info(f"Mapping {len(sorted_temp_paths)} files to {len(sorted_encrypted)} encrypted files")
-                        
-                        for temp_path, enc_path in zip(sorted_temp_paths, sorted_encrypted):
-                            original_path = file_mapping[temp_path]
-                            encrypted_files[original_path] = enc_path
-                            self.logger.debug(f"Mapped: {original_path.name} -> {enc_path.name}")
-                            self.logger.debug(f"  Original: {original_path}")
-                            self.logger.debug(f"  Encrypted: {enc_path}")
-                    else:
-                        self.logger.warning(f"Batch {chunk_idx + 1}: File count mismatch - expected {len(file_mapping)}, got {len(batch_encrypted_files)}")
-                        # Fallback to more complex mapping
-                        for temp_path, original_path in file_mapping.items():
-                            rel_path = temp_path.relative_to(temp_source_path)
-                            
-                            # Search for corresponding encrypted file
-                            for encrypted_file in batch_encrypted_files:
-                                if encrypted_file not in encrypted_files.values():
-                                    encrypted_files[original_path] = encrypted_file
-                                    self.logger.debug(f"Mapped (fallback): {original_path.name} -> {encrypted_file.name}")
-                                    break
-                    
-                    self.logger.info(f"Batch {chunk_idx + 1} complete: encrypted {len([k for k, v in file_mapping.items() if file_mapping[k] in encrypted_files])} files")
-                else:
-                    self.logger.error(f"Encrypted directory not found after batch {chunk_idx + 1} encryption")
+                    "--files-from-raw", "-",  # read the list from stdin
+                    "--transfers", "32",
+                    "--checkers", "32",
+                    "--no-traverse",
+                    "--no-check-dest"
+                ],
+                input=files_list.encode('utf-8')
+            )
             
-            # Small delay between batches to avoid overload
-            if chunk_idx < len(chunks) - 1:
-                self.logger.info(f"Waiting 2 seconds before next batch...")
-                time.sleep(2)
+            if returncode != 0:
+                self.logger.error(f"rclone batch encryption failed for batch {chunk_idx + 1}: {stderr}")
+                return encrypted_files
+        
+        # Map originals to encrypted outputs by relative path using rclone's own listing
+        encrypted_subdir = self._encrypted_name(batch_subdir)
+        entries = self._list_encrypted(f"{self.config.remote_name}:{batch_subdir}", recursive=True)
+        if encrypted_subdir is None or entries is None:
+            self.logger.error(f"Could not list encrypted files for batch {chunk_idx + 1}")
+            return encrypted_files
+        
+        batch_dir = self._encrypted_dir / encrypted_subdir
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        mapped = 0
+        for entry in entries:
+            original_path = file_mapping.get(Path(entry["Path"]))
+            if original_path is None:
+                continue
+            enc_path = batch_dir / entry["EncryptedPath"]
+            encrypted_files[original_path] = enc_path
+            mapped += 1
+            if debug:
+                self.logger.debug(f"Mapped: {original_path.name} -> {enc_path.name}")
+        
+        if mapped != len(file_mapping):
+            self.logger.warning(f"Batch {chunk_idx + 1}: File count mismatch - expected {len(file_mapping)}, got {mapped}")
+        self.logger.info(f"Batch {chunk_idx + 1} complete: encrypted {mapped} files")
         
-        self.logger.info(f"Total encrypted: {len(encrypted_files)} files")
         return encrypted_files
     
     def cleanup_temp_files(self, encrypted_files: Dict[Path, Path]):
-        """Clean up temporary encrypted files"""
+        """Clean up temporary encrypted files
+        
+        Batch outputs live in a per-call run subdirectory of the encrypted
+        directory, so each such subdirectory is removed with a single rmtree. Files directly
+        under the encrypted directory (or elsewhere) are unlinked individually.
+        """
+        batch_dirs = set()
         for encrypted_path in encrypted_files.values():
             try:
-                if encrypted_path.exists():
-                    encrypted_path.unlink()
+                rel_path = encrypted_path.relative_to(self._encrypted_dir)
+            except ValueError:
+                rel_path = None
+            if rel_path is not None and len(rel_path.parts) > 1:
+                batch_dirs.add(self._encrypted_dir / rel_path.parts[0])
+                continue
+            try:
+                encrypted_path.unlink(missing_ok=True)
             except Exception as e:
                 self.logger.warning(f"Failed to clean up {encrypted_path}: {e}")
+        
+        for batch_dir in batch_dirs:
+            try:
+                shutil.rmtree(batch_dir)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"Failed to clean up {batch_dir}: {e}")
+    
+    def remove_empty_output_dirs(self, encrypted_paths) -> None:
+        """Remove the per-call subdirectories of the given encrypted files once they are empty
+        
+        encrypt_dir writes into its own subdirectory of the encrypted directory.
+        Callers that delete those files one by one call this afterwards so the
+        subdirectory does not outlive its files. Non-empty directories are kept.
+        """
+        output_dirs = set()
+        for encrypted_path in encrypted_paths:
+            try:
+                rel_path = Path(encrypted_path).relative_to(self._encrypted_dir)
+            except ValueError:
+                continue
+            if len(rel_path.parts) > 1:
+                output_dirs.add(self._encrypted_dir / rel_path.parts[0])
+        
+        for output_dir in output_dirs:
+            try:
+                output_dir.rmdir()
+            except OSError:
+                # Missing, or still holds files that have not been deleted yet
+                pass
     
     def list_remotes(self) -> List[str]:
         """List all configured rclone remotes"""
         try:
-            cmd = ["rclone", "listremotes"]
-            if self.config.config_path:
-                cmd.extend(["--config", self.config.config_path])
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            result = self._spawn_rclone(["listremotes"], text=True)
+            result.check_returncode()
             
             # Parse output (each line is a remote with trailing colon)
             remotes = [line.rstrip(':') for line in result.stdout.strip().split('\n') if line]
@@ -392,16 +712,8 @@ class RcloneClient:
     def get_remote_info(self, remote_name: str) -> Optional[Dict]:
         """Get information about a specific remote"""
         try:
-            cmd = ["rclone", "config", "dump"]
-            if self.config.config_path:
-                cmd.extend(["--config", self.config.config_path])
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            result = self._spawn_rclone(["config", "dump"])
+            result.check_returncode()
             
             config_data = json.loads(result.stdout)
             return config_data.get(remote_name)
@@ -412,7 +724,7 @@ class RcloneClient:
     
     def cleanup_temp_dir(self):
         """Clean up the entire temp directory"""
-        import shutil
+        self._stop_rcd()
         try:
             if self.temp_dir.exists():
                 shutil.rmtree(self.temp_dir)
@@ -420,9 +732,9 @@ class RcloneClient:
         except Exception as e:
             self.logger.warning(f"Failed to clean up temp directory {self.temp_dir}: {e}")
     
-    def __del__(self):
-        """Destructor to ensure temp directory is cleaned up"""
-        try:
-            self.cleanup_temp_dir()
-        except Exception:
-            pass
\ No newline at end of file
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Stop the rcd daemon and remove the temp directory"""
+        self.cleanup_temp_dir()
\ No newline at end of file
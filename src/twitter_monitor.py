@@ -4,6 +4,7 @@ import logging
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
 import re
+from operator import attrgetter, itemgetter
 from pathlib import Path
 import time
 
@@ -11,6 +12,19 @@ from twscrape import API, Tweet
 from dotenv import load_dotenv
 import aiohttp
 
+# aiolimiterがあればUserTweetsの呼び出しをトークンバケットで平準化する
+try:
+    from aiolimiter import AsyncLimiter
+    HAS_AIOLIMITER = True
+except ImportError:
+    HAS_AIOLIMITER = False
+
+# ツイートURLからユーザー名を取り出すパターン
+_TWEET_URL_USER_RE = re.compile(r'twitter\.com/([^/]+)/status/')
+
+# twscrapeのUserTweetsが1リクエストで取得するツイート数（countパラメータ）
+_USER_TWEETS_PAGE_SIZE = 40
+
 # twscrapeの200件制限を回避するためのパッチ
 import httpx
 from twscrape.models import Tweet as TweetModel, to_old_rep, _write_dump
@@ -82,6 +96,76 @@ def make_client_with_timeout(self, proxy: str | None = None) -> AsyncClient:
 twscrape.account.Account.make_client = make_client_with_timeout
 
 
+class CircuitBreaker:
+    """連続して失敗した上流への呼び出しを一定時間遮断するサーキットブレーカー
+    
+    threshold回連続で失敗するとOPENになり、recovery_seconds経過するまで呼び出しを遮断する。
+    経過後は1回だけ試行を許可し（HALF_OPEN）、成功すればCLOSEDに戻り、失敗すれば再びOPENになる。
+    """
+    
+    def __init__(self, threshold: int = 5, recovery_seconds: float = 60.0):
+        self.threshold = threshold
+        self.recovery_seconds = recovery_seconds
+        self.fail_count = 0
+        self.opened_at: Optional[float] = None
+    
+    def is_open(self) -> bool:
+        """呼び出しを遮断すべきならTrue"""
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at < self.recovery_seconds:
+            return True
+        # HALF_OPEN: この呼び出しだけを通し、結果が出るまで他の呼び出しは遮断したままにする
+        self.opened_at = time.monotonic()
+        return False
+    
+    def on_success(self):
+        self.fail_count = 0
+        self.opened_at = None
+    
+    def on_failure(self):
+        self.fail_count += 1
+        if self.fail_count >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class _FetchDeadline:
+    """現在のタスクを期限切れでキャンセルする1つのタイマー
+    
+    ツイートごとにタイマーを作らず、取得全体で1回だけ設定する。pause()とresume()の
+    間の時間は期限に含めない。期限切れでキャンセルされたかはexpiredで判定する
+    """
+    
+    def __init__(self, timeout: float):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._remaining = timeout
+        self._deadline = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self.expired = False
+    
+    def resume(self):
+        self._deadline = self._loop.time() + self._remaining
+        self._handle = self._loop.call_later(self._remaining, self._expire)
+    
+    def pause(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self._remaining = max(self._deadline - self._loop.time(), 0)
+    
+    def _expire(self):
+        self._handle = None
+        self.expired = True
+        self._task.cancel()
+    
+    def clear_cancel(self):
+        """期限切れによるキャンセル要求を取り消す（Python 3.11以降のみ必要）"""
+        uncancel = getattr(self._task, 'uncancel', None)
+        if uncancel is not None:
+            uncancel()
+
+
 class TwitterMonitor:
     def __init__(self, config: dict, db_manager=None, event_detector=None):
         self.config = config
@@ -91,14 +175,21 @@ class TwitterMonitor:
         self._session = None
         self.db_manager = db_manager
         self._timeout_seconds = 300  # 5分のタイムアウト
+        # user_tweetsの同時実行数を制限するセマフォ（_initialize_accountsで作成）
+        self._fetch_sem: Optional[asyncio.Semaphore] = None
+        # UserTweetsの呼び出しレート制限（_initialize_accountsで作成、aiolimiterがない場合はNone）
+        self._user_tweets_limiter = None
         
-        # リトライカウンタを初期化
-        self._tweet_retry_count = 0
-        self._http_retry_count = 0
+        # 障害時にtwscrapeへのリトライを繰り返さないためのサーキットブレーカー
+        twscrape_config = config.get('tweet_settings', {}).get('twscrape', {})
+        self._circuit = CircuitBreaker(
+            threshold=twscrape_config.get('circuit_breaker_threshold', 5),
+            recovery_seconds=twscrape_config.get('circuit_breaker_recovery_seconds', 60)
+        )
         
         # gallery-dl extractorを初期化
         from .gallery_dl_extractor import GalleryDLExtractor
-        self.gallery_dl_extractor = GalleryDLExtractor(config, event_detector)
+        self.gallery_dl_extractor = GalleryDLExtractor(config, event_detector, db_manager)
     
     async def _initialize_accounts(self):
         """Twitter認証アカウントを初期化"""
@@ -171,6 +262,7 @@ class TwitterMonitor:
             await self.api.pool.login_all()
             
             # ログイン後、実際に利用可能なアカウントがあるか確認
+            active_count = total_accounts
             try:
                 pool_stats = await self.api.pool.stats()
                 self.logger.info(f"Initial pool stats: {pool_stats}")
@@ -186,6 +278,16 @@ class TwitterMonitor:
             except Exception as e:
                 self.logger.warning(f"Could not verify account status: {e}")
             
+            # 同時に取得するユーザー数をアクティブなアカウント数までに制限（設定で上書き可能）
+            twscrape_config = self.config.get('tweet_settings', {}).get('twscrape', {})
+            max_concurrent_users = twscrape_config.get('max_concurrent_users') or active_count
+            self._fetch_sem = asyncio.Semaphore(max(1, max_concurrent_users))
+            
+            # レート制限に達する前に呼び出しを待たせる（15分あたりアカウント数×上限回）
+            if HAS_AIOLIMITER:
+                per_account = twscrape_config.get('user_tweets_per_15min', 150)
+                self._user_tweets_limiter = AsyncLimiter(per_account * max(1, active_count), 900)
+            
             self._accounts_initialized = True
             self.logger.info(f"Initialized {total_accounts} Twitter account(s)")
             
@@ -193,25 +295,27 @@ class TwitterMonitor:
             self.logger.error(f"Failed to initialize Twitter accounts: {e}")
             raise
     
-    def _is_retweet(self, tweet: Tweet, username: str) -> bool:
-        """リツイート/リポストかどうかを判定"""
+    def _is_retweet(self, tweet: Tweet, username_lower: str) -> bool:
+        """リツイート/リポストかどうかを判定（username_lowerは小文字化済みのユーザー名）"""
         # 方法1: retweetedTweet属性をチェック
-        if hasattr(tweet, 'retweetedTweet') and tweet.retweetedTweet is not None:
+        if getattr(tweet, 'retweetedTweet', None) is not None:
             self.logger.debug(f"Tweet {tweet.id} is a retweet (has retweetedTweet)")
             return True
         
         # 方法2: ユーザーIDが異なる場合
-        if hasattr(tweet, 'user') and hasattr(tweet.user, 'id'):
-            if str(tweet.user.username).lower() != username.lower():
+        user = getattr(tweet, 'user', None)
+        if getattr(user, 'id', None) is not None:
+            if str(user.username).lower() != username_lower:
                 self.logger.debug(f"Tweet {tweet.id} is a retweet (different user)")
                 return True
         
         # 方法3: URLからユーザー名を抽出して比較
-        if hasattr(tweet, 'url'):
-            url_match = re.search(r'twitter\.com/([^/]+)/status/', tweet.url)
+        url = getattr(tweet, 'url', None)
+        if url:
+            url_match = _TWEET_URL_USER_RE.search(url)
             if url_match:
                 url_username = url_match.group(1).lower()
-                if url_username != username.lower():
+                if url_username != username_lower:
                     self.logger.debug(f"Tweet {tweet.id} is a retweet (URL mismatch)")
                     return True
         
@@ -253,6 +357,8 @@ class TwitterMonitor:
             self.logger.info(f"Quick check: Checking for new tweets for @{username} (latest ID: {latest_tweet_id})")
             
             # 最新の1件だけチェック
+            if self._user_tweets_limiter is not None:
+                await self._user_tweets_limiter.acquire()
             start_time = time.time()
             async for tweet in self.api.user_tweets(user.id):
                 # タイムアウトチェック（10秒）
@@ -280,7 +386,7 @@ class TwitterMonitor:
             # エラーの場合は安全のため新着ありとして扱う
             return True
     
-    async def get_user_tweets_with_gallery_dl_first(self, username: str, days_lookback: int = 365, force_full_fetch: bool = False, event_detection_enabled: bool = True) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    async def get_user_tweets_with_gallery_dl_first(self, username: str, days_lookback: int = 365, force_full_fetch: bool = False, event_detection_enabled: bool = True, pre_crawl_latest_map: Optional[Dict[str, tuple]] = None) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
         gallery-dl優先でツイートを取得
         
@@ -289,6 +395,8 @@ class TwitterMonitor:
             days_lookback: 過去何日分を取得するか
             force_full_fetch: 強制的に全件取得するか
             event_detection_enabled: このアカウントでイベント検知を行うか
+            pre_crawl_latest_map: get_latest_tweet_info_bulkで事前に取得した{username: (最新日時, 最新ID)}
+                （省略時はこのユーザー分をDBから個別に取得）
         
         Returns:
             (全ツイート, イベント関連ツイート)のタプル
@@ -311,7 +419,9 @@ class TwitterMonitor:
         # DB から今回のクロール実行前の最新ツイート日時を記録（twscrape用）
         pre_crawl_latest_date = None
         pre_crawl_latest_id = None
-        if self.db_manager:
+        if pre_crawl_latest_map is not None:
+            pre_crawl_latest_date, pre_crawl_latest_id = pre_crawl_latest_map.get(username, (None, None))
+        elif self.db_manager:
             pre_crawl_latest_date = self.db_manager.get_latest_tweet_date(username)
             pre_crawl_latest_id = self.db_manager.get_latest_tweet_id(username)
         
@@ -353,25 +463,21 @@ class TwitterMonitor:
             self.logger.info(f"Step 2: Fetching remaining tweets with twscrape for @{username}")
             try:
                 # twscrapeは事前に記録した最新日時を基準に効率化
+                # gallery-dlで取得済みのツイートIDは取得ループ内で除外する
+                gallery_tweet_ids = {tweet['id'] for tweet in all_tweets}
                 twscrape_tweets = await self._get_user_tweets_twscrape_only(
                     username, 
                     days_lookback, 
                     twscrape_force_full,  # twscrape独自のforce_full_fetchを使用
                     latest_date_override=pre_crawl_latest_date,
                     latest_id_override=pre_crawl_latest_id,
-                    is_private_account=is_private_account
+                    is_private_account=is_private_account,
+                    exclude_ids=gallery_tweet_ids
                 )
                 
                 if twscrape_tweets:
-                    # gallery-dlで取得済みのツイートIDを除外
-                    gallery_tweet_ids = {tweet['id'] for tweet in all_tweets}
-                    new_twscrape_tweets = [
-                        tweet for tweet in twscrape_tweets 
-                        if tweet['id'] not in gallery_tweet_ids
-                    ]
-                    
-                    all_tweets.extend(new_twscrape_tweets)
-                    self.logger.info(f"twscrape added {len(new_twscrape_tweets)} additional tweets for @{username} (filtered {len(twscrape_tweets) - len(new_twscrape_tweets)} duplicates)")
+                    all_tweets.extend(twscrape_tweets)
+                    self.logger.info(f"twscrape added {len(twscrape_tweets)} additional tweets for @{username}")
                 
             except Exception as e:
                 self.logger.error(f"twscrape failed for @{username}: {e}")
@@ -379,8 +485,8 @@ class TwitterMonitor:
             self.logger.info("twscrape is disabled, skipping text-only tweet fetching")
         
         # 日付でソート（新しい順）
-        all_tweets.sort(key=lambda x: x['date'], reverse=True)
-        all_event_tweets.sort(key=lambda x: x['date'], reverse=True)
+        all_tweets.sort(key=itemgetter('date'), reverse=True)
+        all_event_tweets.sort(key=itemgetter('date'), reverse=True)
         
         self.logger.info(f"Total tweets retrieved for @{username}: {len(all_tweets)} (including {len(all_event_tweets)} event tweets)")
         
@@ -399,14 +505,20 @@ class TwitterMonitor:
             self.logger.debug(f"Could not check if @{username} is private: {e}")
         return False
     
-    async def _get_user_tweets_twscrape_only(self, username: str, days_lookback: int = 365, force_full_fetch: bool = False, latest_date_override=None, latest_id_override=None, is_private_account: bool = False) -> List[Dict[str, Any]]:
+    async def _get_user_tweets_twscrape_only(self, username: str, days_lookback: int = 365, force_full_fetch: bool = False, latest_date_override=None, latest_id_override=None, is_private_account: bool = False, exclude_ids: Optional[set] = None) -> List[Dict[str, Any]]:
         """
         twscrapeのみでツイートを取得（gallery-dl優先処理用）
         
         Args:
             latest_date_override: 効率化のため外部から指定された最新日時
             latest_id_override: 効率化のため外部から指定された最新ID
+            exclude_ids: 取得済みのため結果から除外するツイートID
         """
+        # 直前まで失敗が続いている場合はtwscrapeを呼ばずに諦める
+        if self._circuit.is_open():
+            self.logger.warning(f"twscrape: Circuit open after repeated failures, skipping @{username}")
+            return []
+        
         # リトライ処理（最大3回）
         max_retries = 3
         retry_count = 0
@@ -420,7 +532,8 @@ class TwitterMonitor:
                 return await self._get_user_tweets_twscrape_internal(
                     username, days_lookback, force_full_fetch, 
                     latest_date_override, latest_id_override,
-                    use_specific_account=use_specific_account
+                    use_specific_account=use_specific_account,
+                    exclude_ids=exclude_ids
                 )
             except TimeoutError as e:
                 retry_count += 1
@@ -436,9 +549,12 @@ class TwitterMonitor:
                     
                     await asyncio.sleep(10 * retry_count)  # 10秒, 20秒, 30秒
                 else:
+                    # リトライを使い切った時点で1回の取得失敗として記録
+                    self._circuit.on_failure()
                     self.logger.error(f"twscrape: Max retries reached for @{username}")
                     raise e
             except Exception as e:
+                self._circuit.on_failure()
                 self.logger.error(f"twscrape: Error for @{username}: {e}")
                 return []
                 
@@ -463,34 +579,37 @@ class TwitterMonitor:
         else:
             self.logger.warning(f"Specific twscrape account {account_num} not configured in .env")
     
-    async def _get_user_tweets_twscrape_internal(self, username: str, days_lookback: int = 365, force_full_fetch: bool = False, latest_date_override=None, latest_id_override=None, use_specific_account: bool = False) -> List[Dict[str, Any]]:
+    async def _get_user_tweets_twscrape_internal(self, username: str, days_lookback: int = 365, force_full_fetch: bool = False, latest_date_override=None, latest_id_override=None, use_specific_account: bool = False, exclude_ids: Optional[set] = None) -> List[Dict[str, Any]]:
         """
-        twscrapeの内部実装（タイムアウトエラーを投げる）
+        twscrapeの内部実装（タイムアウト・取得エラーを投げる）
         """
+        # ツイートIDはintで比較する（twscrapeのIDを文字列化せずに済む）
+        exclude_ids = {int(tweet_id) for tweet_id in exclude_ids} if exclude_ids else set()
         # 既存のget_user_tweetsロジックを流用し、DB取得部分のみoverride値を使用
         await self._initialize_accounts()
         
         tweets = []
         since_date = datetime.now(timezone.utc) - timedelta(days=days_lookback)
-        
-        # データベース接続と既存データの確認
-        from .database import DatabaseManager
-        db_manager = DatabaseManager(self.config)
-        
-        # 既存のツイートIDセットを取得（重複チェック用）
-        existing_tweet_ids = set()
-        if db_manager:
-            existing_tweet_ids = db_manager.get_existing_tweet_ids(username)
-            self.logger.debug(f"Found {len(existing_tweet_ids)} existing tweets in database for @{username}")
+        db_manager = self.db_manager
         
         # override値があればそれを使用、なければDBから取得
         latest_tweet_date = latest_date_override
         latest_tweet_id = latest_id_override
         
-        if latest_tweet_date is None and not force_full_fetch:
+        if latest_tweet_date is None and not force_full_fetch and db_manager:
             latest_tweet_date = db_manager.get_latest_tweet_date(username)
             latest_tweet_id = db_manager.get_latest_tweet_id(username)
         
+        # 既存のツイートIDセットを取得（重複チェック用）
+        # 差分取得では最新ツイート日時以降のIDだけあれば足りる
+        existing_tweet_ids = set()
+        if db_manager:
+            if latest_tweet_date and not force_full_fetch:
+                existing_tweet_ids = db_manager.get_existing_tweet_ids_since(username, latest_tweet_date, as_int=True)
+            else:
+                existing_tweet_ids = db_manager.get_existing_tweet_ids(username, as_int=True)
+            self.logger.debug(f"Found {len(existing_tweet_ids)} existing tweets in database for @{username}")
+        
         # force_full_fetchがfalseで既存データがある場合、新着チェックを実行
         should_fetch_tweets = True
         if not force_full_fetch and latest_tweet_id is not None:
@@ -498,6 +617,8 @@ class TwitterMonitor:
             has_new_tweets = await self.check_for_new_tweets(username, latest_tweet_id)
             if not has_new_tweets:
                 self.logger.info(f"twscrape: Skipping fetch for @{username} (no new tweets detected)")
+                # 新着チェックの応答は得られているので成功として扱う
+                self._circuit.on_success()
                 return []  # 新着がない場合は早期リターン
         
         if not force_full_fetch and latest_tweet_date:
@@ -550,8 +671,12 @@ class TwitterMonitor:
             old_tweets_count = 0
             consecutive_old_tweets = 0
             max_consecutive_old = 20
+            seen_ids = set()  # 今回の取得で追加したツイートID（int）
+            latest_tweet_id_int = int(latest_tweet_id) if latest_tweet_id and not force_full_fetch else None
+            excluded_count = 0
             
-            # kvパラメータで日付フィルタリング
+            # kvパラメータで日付フィルタリング（user_tweetsのリクエスト変数に追加される）
+            # サーバー側で絞り込まれない場合に備え、ID・連続古ツイートでの早期終了は残す
             kv = None
             if latest_tweet_date and not force_full_fetch:
                 kv = {"since_time": latest_tweet_date.isoformat()}
@@ -560,172 +685,120 @@ class TwitterMonitor:
             # 新着チェックは既に実施済みなので、ここでは通常取得を実行
             self.logger.info(f"twscrape: Fetching tweets for @{username} (new tweets confirmed)")
             
-            start_time = time.time()
-            
-            # イテレータ自体にタイムアウトを設定
-            tweet_iterator = self.api.user_tweets(user.id).__aiter__()
+            username_lower = username.lower()
+            # ツイートごとのデバッグログはDEBUG有効時のみ組み立てる
+            debug = self.logger.isEnabledFor(logging.DEBUG)
             
-            while True:
+            # アカウントの取り合いを避けるため、同時に取得するユーザー数を制限
+            async with self._fetch_sem:
+                if self._user_tweets_limiter is not None:
+                    await self._user_tweets_limiter.acquire()
+                
+                # 取得全体に1つの期限を設定（タイムアウト時のリトライ・ローテーションは
+                # _get_user_tweets_twscrape_only側で行う）
+                deadline = _FetchDeadline(self._timeout_seconds)
+                deadline.resume()
                 try:
-                    # 各ツイート取得に30秒のタイムアウトを設定
-                    tweet = await asyncio.wait_for(tweet_iterator.__anext__(), timeout=30.0)
-                    
-                    # 全体のタイムアウトチェック
-                    if time.time() - start_time > self._timeout_seconds:
-                        self.logger.error(f"twscrape: Overall timeout after {self._timeout_seconds}s while fetching tweets for @{username}")
-                        raise TimeoutError(f"Overall timeout while fetching tweets for @{username}")
-                    
-                    total_fetched += 1
-                    self.logger.debug(f"twscrape: Tweet {total_fetched}: ID={tweet.id}, Date={tweet.date}")
-                    
-                    # Tweet IDベースの早期終了
-                    if not force_full_fetch and latest_tweet_id and int(tweet.id) <= int(latest_tweet_id):
-                        self.logger.debug(f"twscrape: Reached known tweet {tweet.id}, stopping")
-                        break
-                    
-                    # 日付チェック
-                    if tweet.date < since_date:
-                        old_tweets_count += 1
-                        consecutive_old_tweets += 1
-                        self.logger.debug(f"twscrape: Skipping old tweet: {tweet.id}")
-                        
-                        if not force_full_fetch and consecutive_old_tweets >= max_consecutive_old:
-                            self.logger.debug(f"twscrape: Reached {max_consecutive_old} consecutive old tweets, stopping")
-                            break
-                        continue
-                    else:
-                        consecutive_old_tweets = 0
-                    
-                    # リツイートをスキップ
-                    if self._is_retweet(tweet, username):
-                        self.logger.debug(f"twscrape: Skipping retweet: {tweet.id}")
-                        continue
-                    
-                    # 既存ツイートとの重複チェック
-                    tweet_id_str = str(tweet.id)
-                    if tweet_id_str in existing_tweet_ids:
-                        self.logger.debug(f"twscrape: Skipping duplicate tweet: {tweet.id}")
-                        continue
-                    
-                    # ツイートデータを抽出
-                    tweet_data = {
-                        'id': str(tweet.id),
-                        'text': tweet.rawContent,
-                        'date': tweet.date.isoformat(),
-                        'url': f"https://twitter.com/{username}/status/{tweet.id}",
-                        'username': username,
-                        'media': [],
-                        'videos': []
-                    }
-                    
-                    # メディア（画像）URLを抽出
-                    if hasattr(tweet, 'media') and hasattr(tweet.media, 'photos'):
-                        tweet_data['media'] = [photo.url for photo in tweet.media.photos]
-                    
-                    # 動画URLを抽出
-                    if hasattr(tweet, 'media') and hasattr(tweet.media, 'videos'):
-                        for video in tweet.media.videos:
-                            best_variant = None
-                            best_bitrate = 0
+                    async for tweet in self._paced_user_tweets(user.id, deadline, kv=kv):
+                        try:
+                            total_fetched += 1
+                            if debug:
+                                self.logger.debug(f"twscrape: Tweet {total_fetched}: ID={tweet.id}, Date={tweet.date}")
                             
-                            if hasattr(video, 'variants'):
-                                for variant in video.variants:
-                                    if hasattr(variant, 'bitrate') and variant.bitrate:
-                                        if variant.bitrate > best_bitrate:
-                                            best_bitrate = variant.bitrate
-                                            best_variant = variant
+                            # Tweet IDベースの早期終了
+                            tweet_id = int(tweet.id)
+                            if latest_tweet_id_int is not None and tweet_id <= latest_tweet_id_int:
+                                self.logger.debug(f"twscrape: Reached known tweet {tweet.id}, stopping")
+                                break
                             
-                            if best_variant and hasattr(best_variant, 'url'):
-                                tweet_data['videos'].append(best_variant.url)
-                            elif hasattr(video, 'url'):
-                                tweet_data['videos'].append(video.url)
-                    
-                    tweets.append(tweet_data)
-                    tweet_count += 1
-                    
-                    # ツイート取得成功時にリトライカウンタをリセット
-                    self._tweet_retry_count = 0
-                    self._http_retry_count = 0
-                    
-                    if tweet_count % 100 == 0:
-                        self.logger.debug(f"twscrape: Fetched {tweet_count} tweets so far...")
-                        
-                except StopAsyncIteration:
-                    # イテレータ終了
-                    self.logger.debug(f"twscrape: Reached end of tweets for @{username}")
-                    break
-                    
-                except asyncio.TimeoutError:
-                    # 個別ツイート取得のタイムアウト - ローテーションしてリトライ
-                    self.logger.warning(f"twscrape: Tweet fetch timeout after 30s")
-                    
-                    # 個別ツイートレベルでのリトライ（最大2回）
-                    tweet_retry_count = getattr(self, '_tweet_retry_count', 0)
-                    if tweet_retry_count < 2:
-                        self._tweet_retry_count = tweet_retry_count + 1
-                        self.logger.info(f"twscrape: Individual tweet retry {self._tweet_retry_count}/2")
-                        
-                        # アカウントローテーション
-                        try:
-                            await self._rotate_account()
-                            self.logger.info(f"twscrape: Rotated account for individual tweet retry")
-                        except Exception as rotate_error:
-                            self.logger.warning(f"twscrape: Failed to rotate account for tweet retry: {rotate_error}")
-                        
-                        # 短時間待機後にリトライ（同じツイートを再試行）
-                        await asyncio.sleep(5)
-                        continue
-                    else:
-                        # 最大リトライ数に達したら次のツイートに進む
-                        self.logger.warning(f"twscrape: Max individual tweet retries reached, skipping to next tweet")
-                        self._tweet_retry_count = 0  # カウンタリセット
-                        continue
-                    
-                except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
-                    # HTTPタイムアウト - ローテーションしてリトライ
-                    self.logger.warning(f"twscrape: HTTP timeout: {e}")
-                    
-                    # HTTPレベルでのリトライ（最大2回）
-                    http_retry_count = getattr(self, '_http_retry_count', 0)
-                    if http_retry_count < 2:
-                        self._http_retry_count = http_retry_count + 1
-                        self.logger.info(f"twscrape: HTTP retry {self._http_retry_count}/2")
-                        
-                        # アカウントローテーション
-                        try:
-                            await self._rotate_account()
-                            self.logger.info(f"twscrape: Rotated account for HTTP retry")
-                        except Exception as rotate_error:
-                            self.logger.warning(f"twscrape: Failed to rotate account for HTTP retry: {rotate_error}")
-                        
-                        # 指数バックオフで待機
-                        await asyncio.sleep(2 ** self._http_retry_count)  # 2秒, 4秒
-                        continue
+                            # 日付チェック
+                            if tweet.date < since_date:
+                                old_tweets_count += 1
+                                consecutive_old_tweets += 1
+                                if debug:
+                                    self.logger.debug(f"twscrape: Skipping old tweet: {tweet.id}")
+                                
+                                if not force_full_fetch and consecutive_old_tweets >= max_consecutive_old:
+                                    self.logger.debug(f"twscrape: Reached {max_consecutive_old} consecutive old tweets, stopping")
+                                    break
+                                continue
+                            else:
+                                consecutive_old_tweets = 0
+                            
+                            # リツイートをスキップ
+                            if self._is_retweet(tweet, username_lower):
+                                if debug:
+                                    self.logger.debug(f"twscrape: Skipping retweet: {tweet.id}")
+                                continue
+                            
+                            # 既存ツイート・今回取得済みツイートとの重複チェック
+                            if tweet_id in existing_tweet_ids or tweet_id in seen_ids:
+                                if debug:
+                                    self.logger.debug(f"twscrape: Skipping duplicate tweet: {tweet.id}")
+                                continue
+                            seen_ids.add(tweet_id)
+                            
+                            # 他の取得手段（gallery-dl）で取得済みのツイートを除外
+                            if tweet_id in exclude_ids:
+                                excluded_count += 1
+                                continue
+                            
+                            # ツイートデータを抽出
+                            tweet_data = {
+                                'id': str(tweet_id),
+                                'text': tweet.rawContent,
+                                'date': tweet.date.isoformat(),
+                                'url': f"https://twitter.com/{username}/status/{tweet.id}",
+                                'username': username,
+                                'media': [],
+                                'videos': []
+                            }
+                            
+                            media = getattr(tweet, 'media', None)
+                            if media is not None:
+                                # メディア（画像）URLを抽出
+                                photos = getattr(media, 'photos', None)
+                                if photos is not None:
+                                    tweet_data['media'] = [photo.url for photo in photos]
+                                
+                                # 動画URLを抽出
+                                for video in getattr(media, 'videos', None) or ():
+                                    # 最高画質（最大ビットレート）のバリアントを選択、なければ動画自体のURLを使用
+                                    variants = [v for v in getattr(video, 'variants', ()) if getattr(v, 'bitrate', 0)]
+                                    best_variant = max(variants, key=attrgetter('bitrate'), default=None)
+                                    url = getattr(best_variant, 'url', None) or getattr(video, 'url', None)
+                                    if url:
+                                        tweet_data['videos'].append(url)
+                            
+                            tweets.append(tweet_data)
+                            tweet_count += 1
+                            
+                            if tweet_count % 100 == 0:
+                                self.logger.debug(f"twscrape: Fetched {tweet_count} tweets so far...")
+                                
+                        except Exception as e:
+                            # 個別ツイートの処理エラーはスキップして続行
+                            self.logger.warning(f"twscrape: Error processing tweet: {e}")
+                            continue
                     else:
-                        # 最大リトライ数に達したら次のツイートに進む
-                        self.logger.warning(f"twscrape: Max HTTP retries reached, skipping to next tweet") 
-                        self._http_retry_count = 0  # カウンタリセット
-                        continue
+                        self.logger.debug(f"twscrape: Reached end of tweets for @{username}")
                         
-                except Exception as e:
-                    # その他のエラー
-                    self.logger.warning(f"twscrape: Error processing tweet: {e}")
-                    continue
-            
-            # 重複を除去
-            unique_tweets = []
-            seen_ids = set()
-            for tweet in tweets:
-                if tweet['id'] not in seen_ids:
-                    unique_tweets.append(tweet)
-                    seen_ids.add(tweet['id'])
-            
-            duplicate_count = len(tweets) - len(unique_tweets)
-            if duplicate_count > 0:
-                self.logger.warning(f"twscrape: Removed {duplicate_count} duplicate tweets")
+                except asyncio.CancelledError:
+                    if not deadline.expired:
+                        raise
+                    deadline.clear_cancel()
+                    self.logger.error(f"twscrape: Overall timeout after {self._timeout_seconds}s while fetching tweets for @{username}")
+                    raise TimeoutError(f"Overall timeout while fetching tweets for @{username}")
+                except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
+                    # イテレータ自体が終了するため、ここでは再開できない。リトライは呼び出し元に任せる
+                    self.logger.warning(f"twscrape: HTTP timeout while fetching tweets for @{username}: {e}")
+                    raise TimeoutError(f"HTTP timeout while fetching tweets for @{username}") from e
+                finally:
+                    deadline.pause()
             
-            self.logger.info(f"twscrape: Fetched {len(unique_tweets)} unique tweets for @{username} (examined: {total_fetched}, old skipped: {old_tweets_count})")
-            return unique_tweets
+            self._circuit.on_success()
+            self.logger.info(f"twscrape: Fetched {len(tweets)} unique tweets for @{username} (examined: {total_fetched}, old skipped: {old_tweets_count}, already fetched: {excluded_count})")
+            return tweets
             
         except Exception as e:
             if "No account available" in str(e):
@@ -735,12 +808,27 @@ class TwitterMonitor:
                 if next_available_match:
                     next_time = next_available_match.group(1)
                     self.logger.info(f"twscrape: Next available time: {next_time}")
-            else:
-                self.logger.error(f"twscrape: Error fetching tweets for @{username}: {e}")
-            # タイムアウトエラーは再スロー
-            if isinstance(e, TimeoutError):
-                raise e
-            return []
+            # サーキットブレーカーへの失敗記録とエラーログはリトライ判定を行う
+            # _get_user_tweets_twscrape_only側で行う
+            raise
+    
+    async def _paced_user_tweets(self, user_id: int, deadline: _FetchDeadline, kv=None):
+        """user_tweetsのツイートを返しつつ、次のページを要求する前にレート制限のトークンを取得する
+        
+        最初のページ分のトークンは呼び出し元で取得済みとする。
+        トークン待ちの間はdeadlineを止め、取得の期限に含めない
+        """
+        count = 0
+        async for tweet in self.api.user_tweets(user_id, kv=kv):
+            yield tweet
+            count += 1
+            if count % _USER_TWEETS_PAGE_SIZE == 0 and self._user_tweets_limiter is not None:
+                # 全ユーザーで共有するトークンの待ち時間で期限切れにならないようにする
+                deadline.pause()
+                try:
+                    await self._user_tweets_limiter.acquire()
+                finally:
+                    deadline.resume()
     
     async def get_user_tweets(self, username: str, days_lookback: int = 365, force_full_fetch: bool = False) -> List[Dict[str, Any]]:
         """指定ユーザーのツイートを取得（リツイート除く）"""
@@ -748,10 +836,7 @@ class TwitterMonitor:
         
         tweets = []
         since_date = datetime.now(timezone.utc) - timedelta(days=days_lookback)
-        
-        # データベース接続と既存データの確認
-        from .database import DatabaseManager
-        db_manager = DatabaseManager(self.config)
+        db_manager = self.db_manager
         
         # 既存のツイートIDセットを取得（重複チェック用）
         existing_tweet_ids = set()
@@ -763,7 +848,7 @@ class TwitterMonitor:
         latest_tweet_date = None
         latest_tweet_id = None
         
-        if not force_full_fetch:
+        if not force_full_fetch and db_manager:
             latest_tweet_date = db_manager.get_latest_tweet_date(username)
             latest_tweet_id = db_manager.get_latest_tweet_id(username)
             
@@ -852,8 +937,9 @@ class TwitterMonitor:
             # force_full_fetchの場合、アカウントプールの状態を定期的に確認
             check_interval = 500  # 500ツイートごとにチェック
             
+            username_lower = username.lower()
             start_time = time.time()
-            async for tweet in self.api.user_tweets(user.id):
+            async for tweet in self.api.user_tweets(user.id, kv=kv):
                 # タイムアウトチェック
                 if time.time() - start_time > self._timeout_seconds:
                     self.logger.error(f"Timeout after {self._timeout_seconds}s while fetching tweets for @{username}")
@@ -890,7 +976,7 @@ class TwitterMonitor:
                     consecutive_old_tweets = 0  # 新しいツイートが見つかったらリセット
                 
                 # リツイートをスキップ
-                if self._is_retweet(tweet, username):
+                if self._is_retweet(tweet, username_lower):
                     self.logger.debug(f"Skipping retweet: {tweet.id} (retweetedTweet: {hasattr(tweet, 'retweetedTweet') and tweet.retweetedTweet is not None})")
                     continue
                 
@@ -911,29 +997,21 @@ class TwitterMonitor:
                     'videos': []  # 動画URLを格納
                 }
                 
-                # メディア（画像）URLを抽出
-                if hasattr(tweet, 'media') and hasattr(tweet.media, 'photos'):
-                    tweet_data['media'] = [photo.url for photo in tweet.media.photos]
-                
-                # 動画URLを抽出
-                if hasattr(tweet, 'media') and hasattr(tweet.media, 'videos'):
-                    for video in tweet.media.videos:
-                        # 最高画質のバリアントを選択
-                        best_variant = None
-                        best_bitrate = 0
-                        
-                        if hasattr(video, 'variants'):
-                            for variant in video.variants:
-                                if hasattr(variant, 'bitrate') and variant.bitrate:
-                                    if variant.bitrate > best_bitrate:
-                                        best_bitrate = variant.bitrate
-                                        best_variant = variant
-                        
-                        if best_variant and hasattr(best_variant, 'url'):
-                            tweet_data['videos'].append(best_variant.url)
-                        elif hasattr(video, 'url'):
-                            # variantsがない場合は直接URLを使用
-                            tweet_data['videos'].append(video.url)
+                media = getattr(tweet, 'media', None)
+                if media is not None:
+                    # メディア（画像）URLを抽出
+                    photos = getattr(media, 'photos', None)
+                    if photos is not None:
+                        tweet_data['media'] = [photo.url for photo in photos]
+                    
+                    # 動画URLを抽出
+                    for video in getattr(media, 'videos', None) or ():
+                        # 最高画質（最大ビットレート）のバリアントを選択、なければ動画自体のURLを使用
+                        variants = [v for v in getattr(video, 'variants', ()) if getattr(v, 'bitrate', 0)]
+                        best_variant = max(variants, key=attrgetter('bitrate'), default=None)
+                        url = getattr(best_variant, 'url', None) or getattr(video, 'url', None)
+                        if url:
+                            tweet_data['videos'].append(url)
                 
                 # force_full_fetchでかつ動画がない場合はスキップ
                 if force_full_fetch and not tweet_data['videos']:
@@ -965,7 +1043,7 @@ class TwitterMonitor:
                 self.logger.info(f"gallery-dl integration enabled for @{username}")
                 try:
                     from .gallery_dl_extractor import GalleryDLExtractor
-                    gallery_extractor = GalleryDLExtractor(self.config)
+                    gallery_extractor = GalleryDLExtractor(self.config, db_manager=self.db_manager)
                     
                     # gallery-dlでメディア付きツイートを取得（制限なし）
                     self.logger.info(f"Fetching all media tweets with gallery-dl")
@@ -1006,7 +1084,7 @@ class TwitterMonitor:
                             unique_tweets.extend(new_from_gallery)
                             
                             # 日付でソート（新しい順）
-                            unique_tweets.sort(key=lambda x: x['date'], reverse=True)
+                            unique_tweets.sort(key=itemgetter('date'), reverse=True)
                         else:
                             self.logger.info(f"No new tweets from gallery-dl (all {len(gallery_tweets)} were duplicates)")
                     else:
@@ -1068,11 +1146,11 @@ class TwitterMonitor:
             # リツイート/リポストをチェック（ユーザー名が不明な場合は、URLから抽出）
             username_for_check = None
             if hasattr(tweet, 'url'):
-                url_match = re.search(r'twitter\.com/([^/]+)/status/', tweet.url)
+                url_match = _TWEET_URL_USER_RE.search(tweet.url)
                 if url_match:
                     username_for_check = url_match.group(1)
             
-            if username_for_check and self._is_retweet(tweet, username_for_check):
+            if username_for_check and self._is_retweet(tweet, username_for_check.lower()):
                 self.logger.debug(f"Tweet {tweet_id} is a retweet, skipping")
                 return None
             